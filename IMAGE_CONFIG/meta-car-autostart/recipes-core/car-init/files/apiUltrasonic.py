@@ -1,68 +1,49 @@
 
 # apiUltrasonic.py
-from flask import Flask, jsonify, request
-from ultrasonic_sensor import UltrasonicSensor
-import threading
-import time
+from flask import Flask, Response, jsonify, request
+from car_config import (ULTRASONIC_PINS, ULTRASONIC_TIMEOUT, SAMPLE_RATE_HZ, SEPARATION_S,
+                        BUFFER_SIZE, MEDIAN_SIZE, STREAM_QUEUE, SENSORS_PORT)
+from ultrasonic_sensor import init_sensor
+from sensor_sampler import (SensorSampler, SampleBuffer, SampleBroadcaster,
+                            buffered_reading, sse_event)
+from sensor_filters import FilterPipeline
+from sensor_feed import SensorFeedPublisher
+from state_bus import open_state_bus
 
 app = Flask(__name__)
 
-GLOBAL_TIMEOUT = 0.04  # seconds
-
-# --- Safe initialization ---
-def init_sensor(name, trig, echo):
-    try:
-        sensor = UltrasonicSensor(trig_pin=trig, echo_pin=echo, timeout=GLOBAL_TIMEOUT)
-        test = sensor.get_distance()
-        if test is None:
-            print(f"[WARN] Sensor '{name}' not responding. Marked as inactive.")
-            return None
-        print(f"[OK] Sensor '{name}' initialized successfully.")
-        return sensor
-    except Exception as e:
-        print(f"[ERROR] Cannot initialize sensor '{name}': {e}")
-        return None
-
-
 # --- Two sensors setup ---
-sensors = {
-    "front": init_sensor("front", 5, 6),
-    "rear": init_sensor("rear", 19, 26)
-}
-
-latest_readings = {"front": 0.0, "rear": 0.0}
-stop_thread = False
-
-
-# --- Safe reading wrappers ---
-def safe_distance(sensor):
-    """Read safely from one sensor."""
-    if sensor is None or not getattr(sensor, "available", False):
-        return 0.0, "not detected"
-    dist = sensor.get_distance()
-    if dist is None:
-        return 0.0, "timeout"
-    return round(dist, 2), "ok"
-
-
-def safe_average(sensor, samples=5, delay=0.05):
-    """Average reading safely."""
-    if sensor is None or not getattr(sensor, "available", False):
-        return 0.0, "not detected"
-    dist = sensor.get_average_distance(samples=samples, delay=delay)
-    if dist is None:
-        return 0.0, "timeout"
-    return round(dist, 2), "ok"
-
-
-def sensor_loop(interval=0.3):
-    """Background thread that updates readings periodically."""
-    global latest_readings
-    while not stop_thread:
-        for name, sensor in sensors.items():
-            dist, _ = safe_average(sensor)
-            latest_readings[name] = dist
-        time.sleep(interval)
+sensors = {name: init_sensor(name, trig, echo, ULTRASONIC_TIMEOUT)
+           for name, (trig, echo) in ULTRASONIC_PINS.items()}
+
+# The sampler interleaves front/rear triggers in its own thread and is the
+# only one touching the pins; HTTP handlers answer from the sample buffer
+# Every raw sample also goes through median + Kalman for smoothed distance and closing speed
+sampler = SensorSampler(sensors, rate_hz=SAMPLE_RATE_HZ, min_separation=SEPARATION_S,
+                        filter_factory=lambda: FilterPipeline(median_size=MEDIAN_SIZE))
+buffer = SampleBuffer(sensors, size=BUFFER_SIZE)
+sampler.subscribe(buffer.append)
+# Push stream: each SSE client gets its own bounded queue
+broadcaster = SampleBroadcaster(queue_size=STREAM_QUEUE)
+sampler.subscribe(broadcaster.publish)
+# Local feed to car_api.py: its speed governor reacts to every sample as it is taken
+feed = SensorFeedPublisher()
+sampler.subscribe(feed.publish)
+# Latest distance per sensor in the shared state bus, readable by any process without HTTP
+state_bus = open_state_bus()
+if state_bus:
+    sampler.subscribe(state_bus.publish_sensor)
+
+
+# --- Buffered reading helpers ---
+def _optional(name, cast):
+    value = request.args.get(name)
+    return cast(value) if value not in (None, "") else None
+
+
+def sensor_reading(name, samples=None, window_ms=None, max_age_ms=None):
+    return buffered_reading(buffer, sensors[name], name, samples=samples,
+                            window_ms=window_ms, max_age_ms=max_age_ms)
 
 
 # --- API Routes ---
@@ -75,57 +56,91 @@ def index():
             "/sensors",
             "/sensor/<name>",
             "/sensor/<name>/average",
-            "/status"
+            "/status",
+            "/stream"
         ]
     })
 
 
 @app.route("/sensors", methods=["GET"])
 def get_all_sensors():
-    """Return average readings from all sensors."""
-    result = {}
-    for name, sensor in sensors.items():
-        dist, status = safe_average(sensor)
-        result[name] = {"distance_cm": dist, "status": status}
-    return jsonify(result)
+    """Return buffered average readings from all sensors."""
+    samples = int(request.args.get("samples", 5))
+    max_age_ms = _optional("max_age_ms", float)
+    return jsonify({name: sensor_reading(name, samples=samples, max_age_ms=max_age_ms)
+                    for name in sensors})
 
 
 @app.route("/sensor/<name>", methods=["GET"])
 def get_sensor_distance(name):
-    """Immediate reading from one sensor."""
+    """Most recent reading from one sensor."""
     if name not in sensors:
         return jsonify({"error": f"Sensor '{name}' not found"}), 404
 
-    dist, status = safe_distance(sensors[name])
-    return jsonify({"sensor": name, "distance_cm": dist, "status": status})
+    reading = sensor_reading(name, samples=1, max_age_ms=_optional("max_age_ms", float))
+    return jsonify(dict(reading, sensor=name))
 
 
 @app.route("/sensor/<name>/average", methods=["GET"])
 def get_sensor_average(name):
-    """Averaged reading from one sensor."""
+    """Averaged reading from one sensor over the last samples and/or window_ms."""
     if name not in sensors:
         return jsonify({"error": f"Sensor '{name}' not found"}), 404
 
-    samples = int(request.args.get("samples", 5))
-    delay = float(request.args.get("delay", 0.05))
-    dist, status = safe_average(sensors[name], samples=samples, delay=delay)
-    return jsonify({"sensor": name, "distance_cm": dist, "status": status})
+    window_ms = _optional("window_ms", float)
+    samples = _optional("samples", int)
+    if samples is None and window_ms is None:
+        samples = 5
+    reading = sensor_reading(name, samples=samples, window_ms=window_ms,
+                             max_age_ms=_optional("max_age_ms", float))
+    return jsonify(dict(reading, sensor=name))
 
 
 @app.route("/status", methods=["GET"])
 def get_status():
     """Return latest background readings."""
+    latest = sampler.get_latest()
     return jsonify({
-        "latest_distances_cm": latest_readings,
-        "running": not stop_thread
+        "latest_distances_cm": {
+            name: round(sample.distance_cm, 2) if sample.distance_cm is not None else 0.0
+            for name, sample in latest.items()
+        },
+        "samples": {
+            name: {"status": sample.status, "timestamp": sample.timestamp,
+                   "filtered_cm": sample.filtered_cm, "velocity_cms": sample.velocity_cms,
+                   "ttc_s": sample.ttc_s}
+            for name, sample in latest.items()
+        },
+        "rate_hz": SAMPLE_RATE_HZ,
+        "running": sampler.running,
+        "feed": {"sent": feed.sent, "dropped": feed.dropped}
     })
 
 
+@app.route("/stream", methods=["GET"])
+def stream():
+    """Server-Sent Events: one event per new sample, pushed as the sampler produces it."""
+    def generate():
+        sub = broadcaster.subscribe()
+        try:
+            yield "retry: 1000\n\n"
+            while True:
+                events = sub.get(timeout=15.0)
+                if not events:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "".join(sse_event(seq, sample) for seq, sample in events)
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 # --- Run the API ---
 if __name__ == "__main__":
-    thread = threading.Thread(target=sensor_loop, daemon=True)
-    thread.start()
+    sampler.start()
     try:
-        app.run(host="0.0.0.0", port=5050)
+        app.run(host="0.0.0.0", port=SENSORS_PORT, threaded=True)
     finally:
-        stop_thread = True
+        sampler.stop()
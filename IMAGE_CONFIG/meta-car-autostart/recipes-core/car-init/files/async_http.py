@@ -0,0 +1,212 @@
+# async_http.py
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class Request:
+    def __init__(self, method, target, headers, body, reader, writer):
+        url = urlsplit(target)
+        self.method = method
+        self.path = unquote(url.path)
+        self.args = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+        self.reader = reader
+        self.writer = writer
+        self.head_sent = False   # un handler de streaming ya escribió status y headers
+
+    def write_head(self, status, content_type, headers=None, length=None):
+        """Para handlers de streaming: escribe status + headers y devuelve el writer."""
+        self.head_sent = True
+        self.writer.write(response_head(status, content_type, headers, length))
+        return self.writer
+
+    def json(self):
+        try:
+            return json.loads(self.body or b"{}")
+        except ValueError:
+            return {}
+
+
+class Response:
+    def __init__(self, body=b"", status=200, content_type="text/plain; charset=utf-8",
+                 headers=None):
+        self.body = body.encode() if isinstance(body, str) else body
+        self.status = status
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+def json_response(obj, status=200):
+    return Response(json.dumps(obj), status, "application/json")
+
+
+def response_head(status, content_type, headers=None, length=None):
+    """Status line + headers; streaming handlers write it themselves."""
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+             f"Content-Type: {content_type}",
+             "Access-Control-Allow-Origin: *"]
+    if length is not None:
+        lines.append(f"Content-Length: {length}")
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def websocket_accept(request):
+    """Responde el handshake WebSocket (RFC 6455); False si el request no es un upgrade."""
+    key = request.headers.get("sec-websocket-key")
+    if request.headers.get("upgrade", "").lower() != "websocket" or not key:
+        return False
+    accept = base64.b64encode(hashlib.sha1(key.encode() + WS_GUID).digest()).decode()
+    request.head_sent = True
+    request.writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                          "Upgrade: websocket\r\n"
+                          "Connection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+    return True
+
+
+def ws_header(length, opcode=0x2):
+    """Encabezado de un frame WebSocket del servidor (FIN, sin máscara; 0x2 = binario)."""
+    if length < 126:
+        return bytes((0x80 | opcode, length))
+    if length < 0x10000:
+        return struct.pack("!BBH", 0x80 | opcode, 126, length)
+    return struct.pack("!BBQ", 0x80 | opcode, 127, length)
+
+
+class HTTPServer:
+    """
+    Servidor HTTP/1.1 mínimo sobre asyncio, sin dependencias externas.
+
+    Los handlers son corutinas handler(request, **params). Si devuelven un
+    Response se envía y la conexión sigue viva (keep-alive); si devuelven None
+    es que tomaron el socket (streaming) y la conexión se cierra al terminar.
+    """
+
+    def __init__(self):
+        self.routes = []
+
+    def route(self, path, methods=("GET",)):
+        """Decorador; los segmentos '<nombre>' se pasan como argumentos."""
+        parts = path.strip("/").split("/") if path.strip("/") else []
+
+        def decorator(handler):
+            self.routes.append((tuple(methods), parts, handler))
+            return handler
+        return decorator
+
+    def mount(self, prefix, other):
+        """Agrega las rutas de otro HTTPServer bajo 'prefix' (p. ej. '/camera')."""
+        base = prefix.strip("/").split("/")
+        for methods, parts, handler in other.routes:
+            self.routes.append((methods, base + parts, handler))
+
+    def _match(self, method, path):
+        segments = path.strip("/").split("/") if path.strip("/") else []
+        allowed = False
+        for methods, parts, handler in self.routes:
+            if len(parts) != len(segments):
+                continue
+            params = {}
+            for part, seg in zip(parts, segments):
+                if part.startswith("<") and part.endswith(">"):
+                    params[part[1:-1]] = seg
+                elif part != seg:
+                    break
+            else:
+                if method in methods:
+                    return handler, params
+                allowed = True
+        return None, 405 if allowed else 404
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    writer.write(response_head(400, "text/plain", length=0))
+                    break
+                if not line:
+                    break
+                try:
+                    method, target, _ = line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    writer.write(response_head(400, "text/plain", length=0))
+                    break
+                try:
+                    headers = await self._read_headers(reader)
+                except (ValueError, asyncio.LimitOverrunError):
+                    # readline() convierte el LimitOverrunError en ValueError
+                    writer.write(response_head(431, "text/plain", length=0))
+                    break
+                length = headers.get("content-length", "0") or "0"
+                if not (length.isascii() and length.isdigit()):
+                    writer.write(response_head(400, "text/plain", length=0))
+                    break
+                length = int(length)
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    request = Request(method, target, headers, body, reader, writer)
+                except ValueError:   # target que urlsplit no acepta
+                    writer.write(response_head(400, "text/plain", length=0))
+                    break
+                if method == "OPTIONS":
+                    response = Response(status=204, headers={
+                        "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+                        "Access-Control-Allow-Headers": "Content-Type"})
+                else:
+                    handler, params = self._match(method, request.path)
+                    if handler is None:
+                        response = Response(REASONS[params], status=params)
+                    else:
+                        try:
+                            response = await handler(request, **params)
+                        except ConnectionError:
+                            raise
+                        except Exception as e:
+                            print(f"[ERROR] {method} {request.path}: {e}")
+                            if request.head_sent:
+                                break   # ya hay un status en el socket: solo cerrar
+                            response = Response("internal error", status=500)
+                if response is None:
+                    break
+                writer.write(response_head(response.status, response.content_type,
+                                           response.headers, len(response.body)))
+                writer.write(response.body)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_headers(reader):
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = h.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    async def serve(self, host="0.0.0.0", port=8000):
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
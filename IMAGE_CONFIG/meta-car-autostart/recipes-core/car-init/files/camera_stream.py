@@ -0,0 +1,214 @@
+# camera_stream.py
+import os, threading, time
+from contextlib import contextmanager
+from frame_sources import FPS, create_source
+from frame_tiers import TierEncoder
+from frame_ring import FrameRing
+
+INDEX_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>RPi Camera</title></head>
+<body style="margin:0;background:#111;display:flex;align-items:center;justify-content:center;height:100vh">
+<img src="{prefix}/stream.mjpg" style="max-width:100%;height:auto;border-radius:12px;box-shadow:0 10px 30px rgba(0,0,0,.5)">
+</body></html>"""
+
+def index_html(prefix=""):
+    """Página índice; 'prefix' es donde está montada la cámara ('/camera' en car_runtime.py)."""
+    return INDEX_HTML.format(prefix=prefix.rstrip("/"))
+
+def mjpeg_part(frame, ts=None):
+    """
+    Parte multipart/x-mixed-replace (boundary 'frame') con un JPEG. 'ts' (hora
+    de captura) va en X-Frame-Time para medir latencia de punta a punta.
+    """
+    stamp = b"X-Frame-Time: %.6f\r\n" % ts if ts is not None else b""
+    return b"".join((b"--frame\r\n"
+                     b"Content-Type: image/jpeg\r\n", stamp,
+                     b"Content-Length: ", str(len(frame)).encode(), b"\r\n\r\n",
+                     frame, b"\r\n"))
+
+def clip_chunks(frames, raw=False):
+    """Un chunk por frame del clip: partes multipart, o los JPEG concatenados si 'raw'."""
+    for frame in frames:
+        yield frame.data if raw else mjpeg_part(frame.data, frame.ts)
+
+def frame_headers(frame):
+    return {"X-Frame-Time": f"{frame.ts:.6f}", "X-Frame-Seq": str(frame.seq)}
+
+# segundos sin consumidores antes de apagar la captura (negativo = nunca)
+IDLE_TIMEOUT = float(os.getenv("CAM_IDLE_TIMEOUT", "10"))
+
+# envíos seguidos más lentos que el intervalo de frames antes de bajar de tier
+SLOW_FRAMES_TO_DROP = 5
+
+class CameraStream:
+    def __init__(self, source=None, idle_timeout=IDLE_TIMEOUT):
+        self.source = source or create_source()   # CAM_SOURCE: picamera2, rpicam-vid, archivo, sintético
+        self.lock = threading.Lock()
+        self.state_lock = threading.Lock()   # serializa start/stop del origen
+        self.cond = threading.Condition(self.lock)
+        self.latest = None       # último frame JPEG (memoryview)
+        self.latest_ts = None    # hora de captura del último frame (time.time())
+        self.seq = 0             # contador de frames
+        self.running = False
+        self.consumers = {}      # tipo -> cantidad (stream, snapshot, recorder, ...)
+        self.idle_timeout = idle_timeout
+        self.idle_timer = None
+        self.listeners = []      # callback(frame, seq, ts) por frame, desde el hilo del origen
+        self.tiers = TierEncoder()  # variantes reducidas, compartidas entre clientes
+        self.ring = FrameRing()     # últimos segundos, para /frame.jpg y /clip.mjpg
+        self.subscribe(self.ring.append)
+
+    def _publish(self, frame, ts):
+        """Llamado por el origen con cada JPEG; lo publica a todos los clientes."""
+        with self.cond:
+            self.latest = frame
+            self.latest_ts = ts
+            self.seq += 1
+            seq = self.seq
+            self.cond.notify_all()
+        for callback in self.listeners:
+            callback(frame, seq, ts)
+
+    def subscribe(self, callback):
+        """Registra callback(frame, seq, ts); debe ser rápido (corre en el hilo del origen)."""
+        self.listeners.append(callback)
+
+    def start(self):
+        with self.state_lock:
+            with self.lock:
+                if self.running and self.source.running:
+                    return
+                self.running = True
+            self.source.start(self._publish)
+
+    def stop(self, if_idle=False):
+        """Detiene la captura; con 'if_idle' solo si no hay consumidores (devuelve si la detuvo)."""
+        with self.state_lock:
+            with self.lock:
+                # acquire() suma el consumidor antes de start(): revisarlo aquí cierra la carrera
+                if if_idle and self.consumers:
+                    return False
+                self.running = False
+                self.latest = None   # sin captura no hay "último frame" válido
+            self.source.stop()
+            return True
+
+    def holds_camera(self):
+        """
+        True si la captura tiene el sensor. Sin consumidores lo suelta antes de
+        contestar (Picamera2 lo deja abierto tras el idle stop), así un
+        pipeline H.264 puede tomarlo.
+        """
+        with self.state_lock:
+            with self.lock:
+                idle = not self.running and not self.consumers
+            if idle:
+                self.source.close()
+            return self.source.holds_camera()
+
+    def acquire(self, kind="stream"):
+        """Registra un consumidor y arranca la captura si hace falta."""
+        with self.lock:
+            self.consumers[kind] = self.consumers.get(kind, 0) + 1
+            if self.idle_timer:
+                self.idle_timer.cancel()
+                self.idle_timer = None
+        self.start()
+
+    def release(self, kind="stream"):
+        """Quita un consumidor; sin ninguno, la captura se apaga tras 'idle_timeout'."""
+        with self.lock:
+            n = self.consumers.get(kind, 0) - 1
+            if n > 0:
+                self.consumers[kind] = n
+            else:
+                self.consumers.pop(kind, None)
+            if self.consumers or not self.running or self.idle_timeout < 0 or self.idle_timer:
+                return
+            timer = threading.Timer(self.idle_timeout, lambda: self._idle_stop(timer))
+            timer.daemon = True
+            self.idle_timer = timer
+            timer.start()
+
+    @contextmanager
+    def consumer(self, kind="stream"):
+        self.acquire(kind)
+        try:
+            yield self
+        finally:
+            self.release(kind)
+
+    def _idle_stop(self, timer):
+        with self.lock:
+            if self.consumers or self.idle_timer is not timer:
+                return   # alguien llegó mientras vencía el timer
+            self.idle_timer = None
+        if self.stop(if_idle=True):
+            print("[INFO] Camera idle, capture stopped")
+
+    def frames(self, fps=None, tier=0):
+        """
+        Generador para cada cliente: espera nuevos frames y los envía.
+        Todos leen del mismo 'latest' — soporta múltiples clientes.
+
+        'fps' limita la tasa de este cliente descartando frames; 'tier' elige
+        la variante reducida y baja sola si el cliente no alcanza a recibir.
+        """
+        with self.consumer("stream"):
+            yield from self._frames(fps, tier)
+
+    def _frames(self, fps, tier):
+        min_interval = 1.0 / fps if fps else 0.0
+        budget = max(min_interval, 1.0 / FPS)
+        last = -1
+        last_sent = 0.0
+        slow = 0
+        while True:
+            with self.cond:
+                # espera un frame nuevo
+                if self.seq == last or self.latest is None:
+                    self.cond.wait(timeout=2.0)
+                if self.latest is None:
+                    continue
+                frame = self.latest
+                seq = self.seq
+                ts = self.latest_ts
+            now = time.monotonic()
+            if seq != last and now - last_sent < min_interval * 0.9:
+                last = seq    # decimación: este cliente no quiere todos los frames
+                continue
+            last = seq
+            last_sent = now
+            yield mjpeg_part(self.tiers.get(tier, seq, frame), ts)
+            # el yield vuelve cuando el servidor terminó de escribir el frame
+            slow = slow + 1 if time.monotonic() - now > budget else 0
+            if slow >= SLOW_FRAMES_TO_DROP:
+                tier = self.tiers.lower(tier)
+                slow = 0
+
+    def lores(self):
+        """Frame lores YUV420 (numpy) para visión a bordo; None si el origen no lo ofrece."""
+        with self.consumer("lores"):
+            lores = getattr(self.source, "lores", None)
+            return lores() if lores else None
+
+    def get_snapshot(self, timeout=3.0):
+        """
+        Con la captura corriendo devuelve el último frame. Si está apagada usa
+        el disparo único del origen (rpicam-jpeg) en vez de arrancar el stream;
+        si el origen no lo tiene, arranca la captura y espera el primer frame.
+        """
+        with self.lock:
+            streaming = self.running and self.source.running and self.latest is not None
+        if streaming:
+            return self.latest
+        if not self.consumers:
+            img = self.source.snapshot(timeout)
+            if img is not None:
+                return img
+        with self.consumer("snapshot"):
+            t0 = time.time()
+            with self.cond:
+                while self.latest is None and (time.time() - t0) < timeout:
+                    self.cond.wait(timeout=timeout)
+                return self.latest
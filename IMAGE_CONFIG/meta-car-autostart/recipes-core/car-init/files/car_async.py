@@ -0,0 +1,71 @@
+# car_async.py
+from async_http import HTTPServer, json_response
+
+
+def _int(data, name, default):
+    try:
+        return int(data.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def build_app(car, control=None, governor=None):
+    """
+    Rutas de car_api.py sobre async_http, para el runtime unificado. Los
+    métodos de CarController solo escriben GPIO/PWM y agendan timers, así que
+    corren directo en el event loop.
+    """
+    app = HTTPServer()
+
+    @app.route("/move/<direction>", methods=("POST",))
+    async def move(request, direction):
+        speed = _int(request.json(), "speed", 100)
+        return json_response({"status": car.move(direction, speed)})
+
+    @app.route("/steer/<direction>", methods=("POST",))
+    async def steer(request, direction):
+        pulse = _int(request.json(), "pulse", 200)
+        return json_response({"status": car.steer(direction, pulse_ms=pulse)})
+
+    @app.route("/steering", methods=("GET", "POST"))
+    async def steering(request):
+        if request.method == "POST":
+            data = request.json()
+            if data.get("home"):
+                car.home_steering()
+            elif "position" in data:
+                try:
+                    car.set_steering(float(data["position"]))
+                except (TypeError, ValueError):
+                    return json_response({"error": "position inválida"}, 400)
+        return json_response(car.steering_ctl.status())
+
+    @app.route("/light/<name>", methods=("POST",))
+    async def light(request, name):
+        state = bool(request.json().get("state", True))
+        return json_response({"status": car.toggle_light(name, state)})
+
+    @app.route("/stop", methods=("POST",))
+    async def stop(request):
+        car.stop()
+        return json_response({"status": "Carro detenido"})
+
+    @app.route("/heartbeat", methods=("POST",))
+    async def heartbeat(request):
+        car.heartbeat()
+        return json_response({"status": "ok", "watchdog": car.watchdog_timeout})
+
+    @app.route("/control")
+    async def control_stats(request):
+        stats = control.stats() if control else {}
+        return json_response({**stats, "watchdog": car.watchdog_status(),
+                              "governor": governor.status() if governor else None,
+                              "motion": car.motion_status()})
+
+    @app.route("/state")
+    async def shared_state(request):
+        if car.state_bus is None:
+            return json_response({"error": "state bus no disponible"}, 503)
+        return json_response(car.state_bus.snapshot())
+
+    return app
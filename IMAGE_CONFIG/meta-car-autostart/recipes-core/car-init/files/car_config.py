@@ -0,0 +1,39 @@
+# car_config.py
+# Pines y puertos del carro, compartidos por los APIs sueltos y car_runtime.py
+import os
+
+# Pines tracción
+TRACTION_PWM = 18
+TRACTION_DIR_PINS = {"in1": 23, "in2": 24}
+
+# Pines steering
+STEERING_PWM = 12
+STEERING_DIR_PINS = {"in3": 20, "in4": 21}
+
+# Pines luces
+LIGHTS_PINS = {
+    "left_signal": 25,
+    "right_signal": 26,
+    "main_lights": 27
+}
+
+# Sensores ultrasónicos: nombre -> (trig, echo)
+ULTRASONIC_PINS = {
+    "front": (5, 6),
+    "rear": (19, 26)
+}
+
+# Muestreo de ultrasonido: 25 ms de eco ya cubren 4.3 m (más que max_distance_cm)
+# y dejan una medición lo bastante corta para 20 Hz por sensor con dos sensores
+ULTRASONIC_TIMEOUT = 0.025  # segundos
+SAMPLE_RATE_HZ = float(os.getenv("ULTRASONIC_RATE_HZ", "20"))
+SEPARATION_S = float(os.getenv("ULTRASONIC_SEPARATION_MS", "20")) / 1000.0
+BUFFER_SIZE = int(os.getenv("ULTRASONIC_BUFFER_SIZE", "200"))
+MEDIAN_SIZE = int(os.getenv("ULTRASONIC_MEDIAN", "3"))
+STREAM_QUEUE = int(os.getenv("ULTRASONIC_STREAM_QUEUE", "32"))
+
+# Puertos de los tres APIs y del runtime unificado (CAR_RUNTIME=1 en car_init.sh)
+CAR_PORT = 5000
+CAMERA_PORT = 5001
+SENSORS_PORT = 5050
+RUNTIME_PORT = int(os.getenv("CAR_RUNTIME_PORT", "8000"))
@@ -1,119 +1,291 @@
-import threading, time
-from gpio_adapter import GPIOAdapter
-from pwm_utils import SoftwarePWM
+import os
+import threading
+import time
+from gpio_adapter import GPIOBank
+from motion_profile import MotionProfile, STEERING_ACCEL, STEERING_DECEL
+from steering_controller import SteeringController, create_feedback
+from pwm_utils import create_pwm, get_scheduler
+
+# Dead-man: sin comandos ni heartbeats en este tiempo el carro se detiene (0 = desactivado)
+WATCHDOG_TIMEOUT = float(os.getenv("CAR_WATCHDOG_S", "1.0"))
 
 class CarController:
     def __init__(self, traction_pwm, traction_dir_pins,
                  steering_pwm, steering_dir_pins,
-                 lights_pins, frequency=100):
+                 lights_pins, frequency=100, watchdog_timeout=None, state_bus=None):
         # PWM de tracción
-        self.traction_pwm = SoftwarePWM(traction_pwm, frequency)
+        self.traction_pwm = create_pwm(traction_pwm, frequency)
         self.traction_pwm.start(0)
 
-        # GPIO dirección de tracción
-        self.traction_dir = {name: GPIOAdapter(pin) for name, pin in traction_dir_pins.items()}
-        for gpio in self.traction_dir.values():
-            gpio.set_direction("out")
-
         # PWM de steering
-        self.steering_pwm = SoftwarePWM(steering_pwm, frequency)
+        self.steering_pwm = create_pwm(steering_pwm, frequency)
         self.steering_pwm.start(0)
 
-        # GPIO dirección de steering
-        self.steering_dir = {name: GPIOAdapter(pin) for name, pin in steering_dir_pins.items()}
-        for gpio in self.steering_dir.values():
-            gpio.set_direction("out")
-
+        # Pines de dirección (tracción y steering) y luces en un solo banco:
+        # cada cambio de estado se aplica con una sola escritura
+        self.outputs = GPIOBank({**traction_dir_pins, **steering_dir_pins, **lights_pins})
         # Luces (incluye direccionales y principales)
-        self.lights = {name: GPIOAdapter(pin) for name, pin in lights_pins.items()}
-        for gpio in self.lights.values():
-            gpio.set_direction("out")
+        self.lights = list(lights_pins)
+
+        # Blinkers y pulsos de steering corren como timers del scheduler PWM compartido
+        self.scheduler = get_scheduler()
+        self.lock = threading.Lock()
+        self.blink_timers = {}
+        self.blink_levels = {}
+
+        # Último estado aplicado por drive(): solo se escribe lo que cambia
+        self.throttle = 0
+        self.steering = 0
+        self.light_mask = 0
+
+        # Tope de duty por sentido que impone SpeedGovernor según los sensores
+        self.speed_limits = {"forward": 100, "backward": 100}
+
+        # Watchdog: un solo timer del scheduler, armado solo mientras hay movimiento
+        self.watchdog_timeout = WATCHDOG_TIMEOUT if watchdog_timeout is None else watchdog_timeout
+        self.last_command = time.monotonic()
+        self.watchdog_timer = None
+        self.watchdog_trips = 0
+
+        # Bus de estado en /dev/shm (state_bus.py): otros procesos leen el estado sin HTTP
+        self.state_bus = state_bus
 
-        # Control de blinkers
-        self.blink_threads = {}
-        self.blink_flags = {}
+        # Rampas: los comandos fijan un objetivo y un timer del scheduler lleva
+        # el duty hasta ahí (sin saltos ni inversiones en seco del puente)
+        self.traction_profile = MotionProfile(self.traction_pwm, self.outputs, ("in1", "in2"),
+                                              self.scheduler, self.lock, on_change=self._publish_state)
+        self.steering_profile = MotionProfile(self.steering_pwm, self.outputs, ("in4", "in3"),
+                                              self.scheduler, self.lock, accel=STEERING_ACCEL,
+                                              decel=STEERING_DECEL, on_change=self._publish_state)
+        # Steering por posición absoluta: un solo dueño del motor (PID si hay sensor STEER_FEEDBACK)
+        self.steering_ctl = SteeringController(self.steering_profile, self.scheduler, self.lock,
+                                               feedback=create_feedback(),
+                                               on_change=self._publish_state)
 
     # --- Tracción ---
     def move(self, direction, speed=100):
-        self.traction_pwm.set_duty_cycle(0)
+        if direction not in ("forward", "backward"):
+            return "Dirección inválida para tracción"
+        try:
+            # velocidad en 0..100: el sentido lo da 'direction', nunca el signo
+            speed = max(0, min(100, int(speed)))
+        except (TypeError, ValueError):
+            return "Velocidad inválida"
 
+        with self.lock:
+            self._feed(arm=speed > 0)
+            self.throttle = speed if direction == "forward" else -speed
+            self.traction_profile.set_target(self._traction_duty(self.throttle))
+            self._publish_state()
         if direction == "forward":
-            self.traction_dir["in1"].write(1)
-            self.traction_dir["in2"].write(0)
-            self.traction_pwm.set_duty_cycle(speed)
             return f"Avanzando a {speed}%"
+        return f"Retrocediendo a {speed}%"
 
-        elif direction == "backward":
-            self.traction_dir["in1"].write(0)
-            self.traction_dir["in2"].write(1)
-            self.traction_pwm.set_duty_cycle(speed)
-            return f"Retrocediendo a {speed}%"
+    def _traction_duty(self, throttle):
+        # duty efectivo con signo: lo pedido, acotado por el límite del sentido de marcha
+        if throttle == 0:
+            return 0
+        if throttle > 0:
+            return min(throttle, self.speed_limits["forward"])
+        return -min(-throttle, self.speed_limits["backward"])
 
-        else:
-            return "Dirección inválida para tracción"
+    def limit_speed(self, direction, cap):
+        """Tope de duty para un sentido (SpeedGovernor); rige ya si el carro va hacia allá."""
+        with self.lock:
+            self.speed_limits[direction] = cap
+            self.traction_profile.set_target(self._traction_duty(self.throttle))
+            self._publish_state()
 
-    # --- Steering con pulso ---
+    # --- Steering ---
     def steer(self, direction, pulse_ms=200):
+        # el "pulso" es un corrimiento del objetivo: lo que el motor recorre en pulse_ms a pleno
         if direction == "left":
-            self.steering_dir["in3"].write(1)
-            self.steering_dir["in4"].write(0)
+            sign = -1
         elif direction == "right":
-            self.steering_dir["in3"].write(0)
-            self.steering_dir["in4"].write(1)
+            sign = 1
         else:
             return "Dirección inválida para steering"
 
-        def pulse():
-            self.steering_pwm.set_duty_cycle(100)
-            time.sleep(pulse_ms / 1000.0)
-            self.steering_pwm.set_duty_cycle(0)
-            self.steering_dir["in3"].write(0)
-            self.steering_dir["in4"].write(0)
-
-        threading.Thread(target=pulse, daemon=True).start()
+        with self.lock:
+            self._feed()
+            self.steering = None   # el objetivo ya no es el último de drive()
+            self.steering_ctl.nudge(sign * self.steering_ctl.rate * pulse_ms / 1000.0)
+            self._publish_state()
         return f"Girando {direction} con pulso de {pulse_ms}ms"
 
+    def set_steering(self, position):
+        """Posición absoluta del steering: -100 (tope izquierdo) .. 100 (tope derecho)."""
+        with self.lock:
+            self._feed()
+            self.steering = None
+            self.steering_ctl.set_target(position)
+            self._publish_state()
+            return self.steering_ctl.target
+
+    def home_steering(self):
+        """Sin sensor: lleva el steering al tope izquierdo y al centro para fijar la estimación."""
+        with self.lock:
+            self._feed()
+            self.steering = None
+            self.steering_ctl.home()
+
     # --- Luces ---
     def toggle_light(self, name, state):
         if name not in self.lights:
             return "Luz inválida"
 
+        with self.lock:
+            self._feed()
+            status = self._set_light(name, state)
+            self._publish_state()
+            return status
+
+    def _set_light(self, name, state):
+        # llamado con self.lock tomado
+        bit = 1 << self.lights.index(name)
+        self.light_mask = self.light_mask | bit if state else self.light_mask & ~bit
+
         # Si es blinker (direccionales), manejarlo distinto
         if name in ["left_signal", "right_signal"]:
             if state:  # encender = iniciar parpadeo
-                if name in self.blink_threads and self.blink_flags.get(name, False):
+                if name in self.blink_timers:
                     return f"{name} ya estaba activo"
-                self.blink_flags[name] = True
-                t = threading.Thread(target=self._blink, args=(name,), daemon=True)
-                self.blink_threads[name] = t
-                t.start()
+                self.blink_levels[name] = 0
+                self.blink_timers[name] = self.scheduler.call_later(
+                    0, self._blink, name, on_error=lambda timer: self._blink_failed(name, timer))
                 return f"{name} activado en modo blinker"
             else:  # apagar = detener parpadeo
-                self.blink_flags[name] = False
-                self.lights[name].write(0)
+                self._stop_blink(name)
+                self.outputs.write(name, 0)
                 return f"{name} apagado"
         else:
             # luces normales on/off
-            self.lights[name].write(1 if state else 0)
+            self.outputs.write(name, 1 if state else 0)
             return f"{name} {'encendida' if state else 'apagada'}"
 
-    def _blink(self, name, interval=0.5):
-        while self.blink_flags.get(name, False):
-            self.lights[name].write(1)
-            time.sleep(interval)
-            self.lights[name].write(0)
-            time.sleep(interval)
+    def _blink(self, deadline, name, interval=0.5):
+        with self.lock:
+            if name not in self.blink_timers:
+                return None
+            self.blink_levels[name] ^= 1
+            self.outputs.write(name, self.blink_levels[name])
+            return deadline + interval
+
+    def _blink_failed(self, name, timer):
+        with self.lock:
+            if self.blink_timers.get(name) is timer:
+                del self.blink_timers[name]
+
+    def _stop_blink(self, name):
+        # llamado con self.lock tomado
+        timer = self.blink_timers.pop(name, None)
+        if timer is not None:
+            timer.cancel()
+
+    # --- Control continuo (canal UDP) ---
+    def drive(self, throttle, steering, lights=None):
+        """
+        Aplica un estado completo de una vez: throttle en -100..100 (negativo =
+        atrás), steering como posición objetivo en -100..100 (negativo =
+        izquierda, 0 = centro) y 'lights' como máscara de bits en el orden de
+        self.lights. Solo cambia los objetivos que cambiaron.
+        """
+        throttle = max(-100, min(100, int(throttle)))
+        steering = max(-100, min(100, int(steering)))
+        with self.lock:
+            self._feed(arm=throttle != 0 or steering != 0)
+            # solo objetivos: las rampas y la inversión del puente las hace MotionProfile
+            if throttle != self.throttle:
+                self.throttle = throttle
+                self.traction_profile.set_target(self._traction_duty(throttle))
+
+            if steering != self.steering:
+                # steering es la posición objetivo; reemplaza cualquier steer() pendiente
+                self.steering = steering
+                self.steering_ctl.set_target(steering)
+
+            if lights is not None and lights != self.light_mask:
+                changed = lights ^ self.light_mask
+                for i, name in enumerate(self.lights):
+                    if changed & (1 << i):
+                        self._set_light(name, bool(lights & (1 << i)))
+            self._publish_state()
+
+    # --- Watchdog ---
+    def heartbeat(self):
+        """Mantiene vivo el movimiento actual sin cambiarlo."""
+        with self.lock:
+            self._feed()
+
+    def _feed(self, arm=False):
+        # llamado con self.lock tomado
+        self.last_command = time.monotonic()
+        if arm and self.watchdog_timeout > 0 and self.watchdog_timer is None:
+            self.watchdog_timer = self.scheduler.call_at(
+                self.last_command + self.watchdog_timeout, self._watchdog,
+                on_error=self._watchdog_failed)
+
+    def _watchdog(self, deadline):
+        # Al vencer no se re-arma en cada comando: se re-planifica a la
+        # expiración real (último comando + timeout) y solo dispara si llegó.
+        with self.lock:
+            if self.watchdog_timer is None:
+                return None
+            expiry = self.last_command + self.watchdog_timeout
+            if time.monotonic() < expiry:
+                return expiry
+            self.watchdog_timer = None
+            self.watchdog_trips += 1
+            self._stop_motion()
+            self._publish_state()
+        print(f"[WARN] Watchdog: sin comandos en {self.watchdog_timeout}s, carro detenido")
+        return None
+
+    def _watchdog_failed(self, timer):
+        # el scheduler descartó el timer: el próximo comando con movimiento lo re-arma
+        with self.lock:
+            if self.watchdog_timer is timer:
+                self.watchdog_timer = None
+
+    def watchdog_status(self):
+        return {"timeout": self.watchdog_timeout, "armed": self.watchdog_timer is not None,
+                "since_last_command": round(time.monotonic() - self.last_command, 3),
+                "trips": self.watchdog_trips}
+
+    def _stop_motion(self, release_pins=True):
+        # llamado con self.lock tomado: tracción y steering parados ya (sin rampa),
+        # luces intactas; el steering se queda en la posición donde estaba
+        self.traction_profile.halt()
+        self.steering_ctl.halt()
+        if release_pins:
+            self.outputs.write_many({"in1": 0, "in2": 0, "in3": 0, "in4": 0})
+        self.throttle = 0
+        self.steering = None   # el próximo drive() vuelve a fijar la posición
 
     def stop(self):
-        # Tracción
-        self.traction_pwm.set_duty_cycle(0)
-        for gpio in self.traction_dir.values():
-            gpio.write(0)
-        # Steering
-        self.steering_pwm.set_duty_cycle(0)
-        for gpio in self.steering_dir.values():
-            gpio.write(0)
-        # Luces
-        for name, gpio in self.lights.items():
-            self.blink_flags[name] = False
-            gpio.write(0)
+        with self.lock:
+            # Tracción y steering (los pines se sueltan abajo junto con las luces)
+            self._stop_motion(release_pins=False)
+            if self.watchdog_timer is not None:
+                self.watchdog_timer.cancel()
+                self.watchdog_timer = None
+            # Luces
+            for name in list(self.blink_timers):
+                self._stop_blink(name)
+            # Dirección y luces en una sola escritura
+            self.outputs.write_all(0)
+            self.light_mask = 0
+            self._publish_state()
+
+    def motion_status(self):
+        return {"traction": self.traction_profile.status(), "steering": self.steering_profile.status(),
+                "steering_control": self.steering_ctl.status()}
+
+    def _publish_state(self):
+        # con self.lock tomado; también en cada paso de rampa (on_change)
+        if self.state_bus is None:
+            return
+        self.state_bus.publish_car(
+            self.throttle, round(self.steering_ctl.target), self.traction_pwm.duty_cycle, self.steering_pwm.duty_cycle,
+            self.light_mask, self.speed_limits["forward"], self.speed_limits["backward"],
+            self.watchdog_timer is not None)
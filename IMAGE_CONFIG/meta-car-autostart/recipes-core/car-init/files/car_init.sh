@@ -10,6 +10,11 @@
 DAEMON_DIR="/home/controlcart"
 LOGFILE="/var/log/car_init.log"
 
+# CAR_RUNTIME=1 (e.g. in /etc/default/car_init) runs car_runtime.py: the three
+# APIs in one process on port 8000 under /car, /camera and /sensors
+[ -r /etc/default/car_init ] && . /etc/default/car_init
+CAR_RUNTIME="${CAR_RUNTIME:-0}"
+
 wait_for_network() {
     echo "$(date '+%F %T') [car_init] Waiting for Wi-Fi connection..." >> $LOGFILE
     while true; do
@@ -33,9 +38,13 @@ start() {
     sleep 5
 
     # Launch APIs
-    nohup python3 car_api.py >/var/log/car_api.log 2>&1 &
-    nohup python3 apiCamera.py >/var/log/apiCamera.log 2>&1 &
-    nohup python3 apiUltrasonic.py >/var/log/apiUltrasonic.log 2>&1 &
+    if [ "$CAR_RUNTIME" = "1" ]; then
+        nohup python3 car_runtime.py >/var/log/car_runtime.log 2>&1 &
+    else
+        nohup python3 car_api.py >/var/log/car_api.log 2>&1 &
+        nohup python3 apiCamera.py >/var/log/apiCamera.log 2>&1 &
+        nohup python3 apiUltrasonic.py >/var/log/apiUltrasonic.log 2>&1 &
+    fi
 
     echo "$(date '+%F %T') [car_init] APIs successfully launched after Wi-Fi connection." >> $LOGFILE
 }
@@ -45,6 +54,7 @@ stop() {
     for pid in $(ps | grep "python3 car_api.py" | grep -v grep | awk '{print $1}'); do kill "$pid"; done
     for pid in $(ps | grep "python3 apiCamera.py" | grep -v grep | awk '{print $1}'); do kill "$pid"; done
     for pid in $(ps | grep "python3 apiUltrasonic.py" | grep -v grep | awk '{print $1}'); do kill "$pid"; done
+    for pid in $(ps | grep "python3 car_runtime.py" | grep -v grep | awk '{print $1}'); do kill "$pid"; done
     echo "$(date '+%F %T') [car_init] APIs stopped." >> $LOGFILE
 }
 
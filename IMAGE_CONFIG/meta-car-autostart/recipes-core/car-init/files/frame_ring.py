@@ -0,0 +1,112 @@
+# frame_ring.py
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import deque, namedtuple
+from itertools import islice
+
+RING_SECONDS = float(os.getenv("CAM_RING_SECONDS", "10"))
+RING_MB = float(os.getenv("CAM_RING_MB", "48"))
+
+Frame = namedtuple("Frame", "seq ts data")
+
+
+class FrameRing:
+    """
+    Últimos 'seconds' de frames JPEG, indexados por seq y por hora de captura.
+
+    Acota a la vez por tiempo y por bytes (la cota que llegue primero). Guarda
+    los frames tal como los publica el origen (memoryviews sobre la arena del
+    framer, sin copias): además de 'max_bytes' puede quedar retenida a lo sumo
+    una arena parcial del framer.
+    """
+
+    def __init__(self, seconds=RING_SECONDS, max_bytes=int(RING_MB * 1024 * 1024)):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.frames = deque()
+        self.stamps = deque()    # ts de cada frame, paralelo a 'frames' (para bisect)
+        self.bytes = 0
+        self.evicted = 0
+
+    def append(self, frame, seq, ts):
+        """Listener de CameraStream: callback(frame, seq, ts)."""
+        with self.lock:
+            if self.frames and seq != self.frames[-1].seq + 1:
+                # el origen se reinició: seq y tiempos ya no son continuos
+                self.frames.clear()
+                self.stamps.clear()
+                self.bytes = 0
+            self.frames.append(Frame(seq, ts, frame))
+            self.stamps.append(ts)
+            self.bytes += len(frame)
+            while self.frames and (self.bytes > self.max_bytes or ts - self.stamps[0] > self.seconds):
+                old = self.frames.popleft()
+                self.stamps.popleft()
+                self.bytes -= len(old.data)
+                self.evicted += 1
+
+    def get(self, seq):
+        """Frame con ese seq, o None si ya salió del ring."""
+        with self.lock:
+            if not self.frames:
+                return None
+            i = seq - self.frames[0].seq
+            return self.frames[i] if 0 <= i < len(self.frames) else None
+
+    def nearest(self, ts):
+        """Frame con la hora de captura más cercana a 'ts', o None si el ring está vacío."""
+        with self.lock:
+            if not self.frames:
+                return None
+            i = bisect_left(self.stamps, ts)
+            if i == len(self.frames):
+                return self.frames[-1]
+            if i > 0 and ts - self.stamps[i - 1] <= self.stamps[i] - ts:
+                return self.frames[i - 1]
+            return self.frames[i]
+
+    def clip(self, start, end):
+        """
+        Frames con start <= ts <= end. Solo copia las referencias (no los
+        JPEG): el llamador los va enviando uno por uno.
+        """
+        with self.lock:
+            i = bisect_left(self.stamps, start)
+            j = bisect_right(self.stamps, end, i)
+            return list(islice(self.frames, i, j))
+
+    def stats(self):
+        with self.lock:
+            oldest = self.stamps[0] if self.stamps else None
+            newest = self.stamps[-1] if self.stamps else None
+            return {"frames": len(self.frames), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "seconds": round(newest - oldest, 3) if oldest else 0.0,
+                    "oldest": oldest, "newest": newest, "evicted": self.evicted}
+
+
+def parse_time(value, now=None):
+    """Hora absoluta (epoch) o relativa si es negativa: '-2.5' = hace 2,5 s."""
+    t = float(value)
+    return (now or time.time()) + t if t < 0 else t
+
+
+def clip_bounds(args, now=None):
+    """(start, end) a partir de ?start=&end= o ?seconds=N (los últimos N segundos)."""
+    now = now or time.time()
+    if "seconds" in args:
+        return now - float(args["seconds"]), now
+    start = parse_time(args["start"], now) if "start" in args else 0.0
+    end = parse_time(args["end"], now) if "end" in args else now
+    return start, end
+
+
+def find_frame(ring, args):
+    """Frame pedido con ?seq=N o ?t=<epoch | -segundos>; None si no está en el ring."""
+    if "seq" in args:
+        return ring.get(int(args["seq"]))
+    if "t" in args:
+        return ring.nearest(parse_time(args["t"]))
+    return None
@@ -0,0 +1,81 @@
+# frame_tiers.py
+import os
+import threading
+from collections import namedtuple
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:  # sin OpenCV solo existe el tier original
+    cv2 = np = None
+
+Tier = namedtuple("Tier", "scale quality")
+
+
+def _parse_tiers(spec):
+    """'1.0:0,0.5:70,0.25:50' -> [Tier(1.0, None), ...]; calidad 0 = JPEG original."""
+    tiers = []
+    for item in filter(None, spec.split(",")):
+        scale, quality = item.split(":")
+        tiers.append(Tier(float(scale), int(quality) or None))
+    return tiers
+
+
+# Ordenados de mayor a menor costo de ancho de banda; el tier 0 es el frame de la cámara
+TIERS = _parse_tiers(os.getenv("CAM_TIERS", "1.0:0,0.5:70,0.25:50"))
+
+# Escalas que libjpeg decodifica directo (DCT reducida), sin decodificar a tamaño completo
+_REDUCED = {} if cv2 is None else {
+    0.5: cv2.IMREAD_REDUCED_COLOR_2,
+    0.25: cv2.IMREAD_REDUCED_COLOR_4,
+    0.125: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class TierEncoder:
+    """
+    Variantes reducidas del frame actual, generadas una vez por tier y por
+    frame (no por cliente) y solo para los tiers que alguien está pidiendo.
+    """
+
+    def __init__(self, tiers=None):
+        self.tiers = list(tiers or TIERS) if cv2 is not None else [Tier(1.0, None)]
+        self.locks = [threading.Lock() for _ in self.tiers]
+        self.cache = [(-1, None)] * len(self.tiers)
+
+    def select(self, scale=None, quality=None):
+        """Primer tier que no excede la escala/calidad pedidas (el más bajo si ninguno)."""
+        for i, tier in enumerate(self.tiers):
+            if scale is not None and tier.scale > scale:
+                continue
+            if quality is not None and (tier.quality or 100) > quality:
+                continue
+            return i
+        return len(self.tiers) - 1
+
+    def lower(self, index):
+        return min(index + 1, len(self.tiers) - 1)
+
+    def get(self, index, seq, frame):
+        """JPEG del tier 'index' para el frame 'seq' (el mismo objeto para todos los clientes)."""
+        if index == 0:
+            return frame
+        with self.locks[index]:
+            cached_seq, data = self.cache[index]
+            if cached_seq != seq:
+                data = self._encode(self.tiers[index], frame)
+                self.cache[index] = (seq, data)
+            return data
+
+    @staticmethod
+    def _encode(tier, frame):
+        buf = np.frombuffer(frame, dtype=np.uint8)
+        flag = _REDUCED.get(tier.scale)
+        img = cv2.imdecode(buf, flag if flag is not None else cv2.IMREAD_COLOR)
+        if img is None:
+            return frame  # JPEG que OpenCV no pudo decodificar: se envía el original
+        if flag is None:
+            img = cv2.resize(img, None, fx=tier.scale, fy=tier.scale,
+                             interpolation=cv2.INTER_AREA)
+        ok, out = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, tier.quality or 90])
+        return out.tobytes() if ok else bytes(frame)
@@ -0,0 +1,185 @@
+# h264_stream.py
+import os, shlex, subprocess, threading
+from contextlib import contextmanager, suppress
+from camera_stream import IDLE_TIMEOUT
+from h264_framer import AnnexBFramer
+from frame_sources import WIDTH, HEIGHT, FPS
+
+# Comando que escribe H.264 Annex-B en stdout. Para probar sin cámara:
+#   CAM_H264_CMD="ffmpeg -loglevel quiet -re -f lavfi -i testsrc=size=1280x720:rate=30
+#                 -c:v libx264 -preset ultrafast -tune zerolatency -g 30 -f h264 -"
+H264_CMD = os.getenv("CAM_H264_CMD") or (
+    f"rpicam-vid -t 0 --codec h264 --profile baseline --inline --flush "
+    f"--intra {FPS} --width {WIDTH} --height {HEIGHT} --framerate {FPS} --nopreview -o -")
+# rpicam-vid abre el sensor: no puede correr mientras la captura MJPEG lo tenga
+H264_USES_CAMERA = not os.getenv("CAM_H264_CMD")
+
+# tope de un GOP en caché; si la fuente no manda IDR seguido se recorta
+MAX_GOP_FRAMES = int(os.getenv("CAM_H264_MAX_GOP", "300"))
+
+
+class H264Stream:
+    """
+    Pipeline H.264 junto al MJPEG de CameraStream: un proceso fuente, un hilo
+    pump que separa access units y el GOP en curso (desde el último IDR, con
+    SPS/PPS) en memoria. Un cliente nuevo recibe ese GOP entero y decodifica
+    al instante en vez de esperar el próximo keyframe.
+
+    Con la cámara real solo un pipeline puede tenerla abierta a la vez: el
+    proceso corre mientras haya clientes (acquire/release, como CameraStream)
+    y se detiene 'idle_timeout' s después del último.
+    """
+
+    def __init__(self, cmd=H264_CMD, idle_timeout=IDLE_TIMEOUT, uses_camera=H264_USES_CAMERA):
+        self.cmd = cmd
+        self.uses_camera = uses_camera
+        self.proc = None
+        self.lock = threading.Lock()
+        self.state_lock = threading.Lock()   # serializa start/stop del proceso
+        self.cond = threading.Condition(self.lock)
+        self.consumers = 0
+        self.idle_timeout = idle_timeout
+        self.idle_timer = None
+        self.gop = []            # AccessUnit desde el último keyframe
+        self.seq = 0             # seq del último access unit
+        self.pump_thread = None
+        self.running = False
+        self.listeners = []      # callback(unit) por access unit, desde el hilo del pump
+        self.framer = AnnexBFramer()
+
+    def _start_proc(self):
+        self.proc = subprocess.Popen(
+            shlex.split(self.cmd), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0
+        )
+
+    def _pump(self):
+        """Lee stdout, separa access units y mantiene el GOP en caché."""
+        proc = self.proc   # el de esta corrida: un start() posterior lo reemplaza
+        try:
+            for unit in self.framer.access_units(proc.stdout, self.seq):
+                if not self.running:
+                    break
+                with self.cond:
+                    if unit.keyframe:
+                        self.gop = [unit]
+                    elif len(self.gop) >= MAX_GOP_FRAMES:
+                        # GOP demasiado largo: se retoma en el próximo keyframe
+                        self.gop = []
+                    elif self.gop:
+                        self.gop.append(unit)
+                    self.seq = unit.seq
+                    self.cond.notify_all()
+                for callback in self.listeners:
+                    callback(unit)
+        finally:
+            with self.lock:
+                self.running = False
+                self.gop = []
+            with suppress(Exception):
+                proc.terminate()
+            with suppress(Exception):
+                proc.wait(timeout=2)
+
+    def subscribe(self, callback):
+        """Registra callback(unit); debe ser rápido (corre en el hilo del pump)."""
+        self.listeners.append(callback)
+
+    def start(self):
+        with self.state_lock:
+            with self.lock:
+                if self.running:
+                    return
+                self.running = True
+            self._start_proc()
+            self.pump_thread = threading.Thread(target=self._pump, daemon=True)
+            self.pump_thread.start()
+
+    def stop(self, if_idle=False):
+        """Detiene el proceso; con 'if_idle' solo si no hay clientes (devuelve si lo detuvo)."""
+        with self.state_lock:
+            with self.lock:
+                if if_idle and self.consumers:
+                    return False
+                self.running = False
+            with suppress(Exception):
+                self.proc.terminate()   # desbloquea la lectura de stdout
+            if self.pump_thread:
+                self.pump_thread.join(timeout=2)
+            return True
+
+    def blocked_by(self, cam):
+        """True si la captura MJPEG de 'cam' tiene el sensor que este pipeline necesita."""
+        return self.uses_camera and cam.holds_camera()
+
+    def acquire(self):
+        """Registra un cliente y arranca el proceso si hace falta."""
+        with self.lock:
+            self.consumers += 1
+            if self.idle_timer:
+                self.idle_timer.cancel()
+                self.idle_timer = None
+        self.start()
+
+    def release(self):
+        """Quita un cliente; sin ninguno, el proceso se detiene tras 'idle_timeout'."""
+        with self.lock:
+            self.consumers -= 1
+            if self.consumers or not self.running or self.idle_timeout < 0 or self.idle_timer:
+                return
+            timer = threading.Timer(self.idle_timeout, lambda: self._idle_stop(timer))
+            timer.daemon = True
+            self.idle_timer = timer
+            timer.start()
+
+    @contextmanager
+    def consumer(self):
+        self.acquire()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def _idle_stop(self, timer):
+        with self.lock:
+            if self.consumers or self.idle_timer is not timer:
+                return   # alguien llegó mientras vencía el timer
+            self.idle_timer = None
+        if self.stop(if_idle=True):
+            print("[INFO] H.264 idle, pipeline stopped")
+
+    def units_after(self, seq):
+        """Access units del GOP en caché posteriores a 'seq' (todo el GOP si 'seq' ya no está)."""
+        with self.lock:
+            gop = self.gop
+        if not gop or gop[0].seq > seq + 1:
+            return list(gop)
+        return gop[seq + 1 - gop[0].seq:]
+
+    def units(self):
+        """
+        Generador para cada cliente: primero el GOP en caché, después cada
+        access unit nuevo. Si el cliente se atrasa más que el GOP retoma en
+        el siguiente keyframe (nunca recibe un P-frame sin su referencia).
+        """
+        with self.consumer():
+            yield from self._units()
+
+    def _units(self):
+        last = -1
+        while True:
+            if not self.running:
+                self.start()   # primera vez, o la fuente terminó: relanzarla
+            with self.cond:
+                if self.seq == last or not self.gop:
+                    self.cond.wait(timeout=2.0)
+            units = self.units_after(last)
+            if not units:
+                continue
+            last = units[-1].seq
+            yield b"".join(unit.data for unit in units)
+
+    def stats(self):
+        f = self.framer
+        return {"streaming": self.running, "consumers": self.consumers,
+                "seq": self.seq, "gop": len(self.gop),
+                "nals": f.nals_in, "keyframes": f.keyframes, "bytes_in": f.bytes_in}
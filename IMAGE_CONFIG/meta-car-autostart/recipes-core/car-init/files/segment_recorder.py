@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# segment_recorder.py
+"""
+Grabación continua (caja negra) del stream MJPEG en segmentos de tamaño fijo.
+
+Cada segmento son dos archivos: seg-<epoch_ms>.mjpeg con los JPEG uno tras
+otro y seg-<epoch_ms>.idx con un registro fijo por frame (offset, largo, seq,
+hora de captura). Con el índice se llega a cualquier frame por mmap sin
+recorrer el segmento.
+
+    python3 segment_recorder.py /home/controlcart/recordings            # listar
+    python3 segment_recorder.py /home/controlcart/recordings --at -30 -o f.jpg
+"""
+import argparse, glob, mmap, os, struct, threading, time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+REC_ENABLED = os.getenv("CAM_RECORD", "0") == "1"
+REC_DIR = os.getenv("CAM_REC_DIR", "/home/controlcart/recordings")
+REC_SEGMENT_MB = float(os.getenv("CAM_REC_SEGMENT_MB", "64"))
+REC_QUOTA_MB = float(os.getenv("CAM_REC_QUOTA_MB", "2048"))
+
+# offset u64, largo u32, seq u32, ts f64 (little-endian, sin padding)
+INDEX_RECORD = struct.Struct("<QIId")
+
+IndexEntry = namedtuple("IndexEntry", "offset length seq ts")
+
+_IOV_MAX = 512
+
+
+def _writev_all(fd, buffers):
+    """os.writev hasta escribir todo (escrituras parciales y límite de IOV_MAX)."""
+    buffers = [memoryview(b) for b in buffers]
+    while buffers:
+        n = os.writev(fd, buffers[:_IOV_MAX])
+        while n and buffers:
+            if n >= len(buffers[0]):
+                n -= len(buffers[0])
+                buffers.pop(0)
+            else:
+                buffers[0] = buffers[0][n:]
+                n = 0
+
+
+class SegmentRecorder:
+    """
+    Etapa de grabación alimentada por el bus de frames de CameraStream
+    (append es el listener). El hilo del origen solo encola referencias; un
+    hilo escritor junta frames hasta 'batch_bytes' o 'flush_interval' y los
+    baja al segmento con un solo writev secuencial. Si el escritor se atrasa
+    más de 'max_pending' bytes se descartan frames en vez de frenar al origen.
+    """
+
+    def __init__(self, directory=REC_DIR, segment_bytes=int(REC_SEGMENT_MB * 1024 * 1024),
+                 quota_bytes=int(REC_QUOTA_MB * 1024 * 1024), batch_bytes=1024 * 1024,
+                 flush_interval=1.0, max_pending=16 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.quota_bytes = quota_bytes
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.cond = threading.Condition()
+        self.pending = []
+        self.pending_bytes = 0
+        self.running = False
+        self.thread = None
+        self.fd = self.idx_fd = None
+        self.offset = 0
+        self.segment = None
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.deleted = 0
+
+    def append(self, frame, seq, ts):
+        """Listener de CameraStream: callback(frame, seq, ts)."""
+        with self.cond:
+            if not self.running or self.pending_bytes + len(frame) > self.max_pending:
+                self.dropped += 1
+                return
+            self.pending.append((frame, seq, ts))
+            self.pending_bytes += len(frame)
+            if self.pending_bytes >= self.batch_bytes:
+                self.cond.notify()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._run, name="segment-recorder", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        try:
+            while True:
+                with self.cond:
+                    if self.running and self.pending_bytes < self.batch_bytes:
+                        self.cond.wait(self.flush_interval)
+                    batch, self.pending, self.pending_bytes = self.pending, [], 0
+                    running = self.running
+                if batch:
+                    self._write(batch)
+                if not running:
+                    break
+        finally:
+            self._close_segment()
+
+    def _write(self, batch):
+        size = sum(len(frame) for frame, _, _ in batch)
+        try:
+            if self.fd is None or (self.offset and self.offset + size > self.segment_bytes):
+                self._rotate(batch[0][2])
+            entries = []
+            offset = self.offset
+            for frame, seq, ts in batch:
+                entries.append(INDEX_RECORD.pack(offset, len(frame), seq & 0xFFFFFFFF, ts))
+                offset += len(frame)
+            _writev_all(self.fd, [frame for frame, _, _ in batch])
+            # el índice va después de los datos: nunca apunta a bytes sin escribir
+            _writev_all(self.idx_fd, entries)
+        except OSError as e:
+            print(f"[ERROR] Recorder write failed: {e}")
+            self.errors += 1
+            self._close_segment()   # el próximo lote abre un segmento nuevo
+            return
+        self.offset = offset
+        self.frames_written += len(batch)
+        self.bytes_written += size
+
+    def _rotate(self, ts):
+        self._close_segment()
+        base = os.path.join(self.directory, f"seg-{int(ts * 1000):013d}")
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+        self.fd = os.open(base + ".mjpeg", flags, 0o644)
+        self.idx_fd = os.open(base + ".idx", flags, 0o644)
+        self.offset = os.fstat(self.fd).st_size
+        self.segment = base
+        self._enforce_quota()
+
+    def _close_segment(self):
+        for fd in (self.fd, self.idx_fd):
+            if fd is None:
+                continue
+            try:
+                os.fdatasync(fd)
+                # ya está en la SD: no desplazar la page cache con video viejo
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            except OSError:
+                pass
+            os.close(fd)
+        self.fd = self.idx_fd = None
+        self.offset = 0
+
+    def _enforce_quota(self):
+        """Borra los segmentos más viejos (nunca el actual) hasta entrar en la cuota."""
+        segments = list_segments(self.directory)
+        total = sum(segment_size(base) for base in segments)
+        for base in segments:
+            if total <= self.quota_bytes or base == self.segment:
+                break
+            total -= segment_size(base)
+            for ext in (".mjpeg", ".idx"):
+                try:
+                    os.remove(base + ext)
+                except FileNotFoundError:
+                    pass
+            self.deleted += 1
+
+    def stats(self):
+        return {"recording": self.running, "segment": self.segment, "frames": self.frames_written,
+                "bytes": self.bytes_written, "pending": self.pending_bytes,
+                "dropped": self.dropped, "errors": self.errors, "deleted": self.deleted}
+
+
+def list_segments(directory=REC_DIR):
+    """Rutas base (sin extensión) de los segmentos, de más viejo a más nuevo."""
+    return sorted(path[:-len(".mjpeg")] for path in glob.glob(os.path.join(directory, "seg-*.mjpeg")))
+
+
+def segment_size(base):
+    size = 0
+    for ext in (".mjpeg", ".idx"):
+        try:
+            size += os.path.getsize(base + ext)
+        except OSError:
+            pass
+    return size
+
+
+class SegmentReader:
+    """Acceso aleatorio a los frames de un segmento: índice en memoria + datos por mmap."""
+
+    def __init__(self, base):
+        with open(base + ".idx", "rb") as f:
+            raw = f.read()
+        # un registro a medio escribir al final (corte de energía) se ignora
+        raw = raw[:len(raw) - len(raw) % INDEX_RECORD.size]
+        self.index = [IndexEntry(*rec) for rec in INDEX_RECORD.iter_unpack(raw)]
+        self.stamps = [entry.ts for entry in self.index]
+        self.file = open(base + ".mjpeg", "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        # descartar entradas que apuntan más allá de lo que llegó al disco
+        while self.index and self.index[-1].offset + self.index[-1].length > size:
+            self.index.pop()
+            self.stamps.pop()
+
+    def __len__(self):
+        return len(self.index)
+
+    def frame(self, i):
+        """(IndexEntry, memoryview del JPEG) del frame i; liberar el memoryview antes de close()."""
+        entry = self.index[i]
+        return entry, memoryview(self.map)[entry.offset:entry.offset + entry.length]
+
+    def nearest(self, ts):
+        """Índice del frame con hora de captura más cercana a 'ts'."""
+        i = bisect_left(self.stamps, ts)
+        if i == len(self.stamps) or (i > 0 and ts - self.stamps[i - 1] <= self.stamps[i] - ts):
+            i -= 1
+        return i
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("directory", nargs="?", default=REC_DIR)
+    ap.add_argument("--at", type=float, help="hora del frame (epoch, o negativo: segundos atrás)")
+    ap.add_argument("-o", "--output", default="frame.jpg")
+    args = ap.parse_args()
+
+    segments = list_segments(args.directory)
+    if args.at is None:
+        for base in segments:
+            reader = SegmentReader(base)
+            span = f"{reader.stamps[0]:.3f} .. {reader.stamps[-1]:.3f}" if len(reader) else "-"
+            print(f"{os.path.basename(base)}  {len(reader):6d} frames  "
+                  f"{segment_size(base) / 1e6:8.1f} MB  {span}")
+            reader.close()
+        return
+
+    ts = time.time() + args.at if args.at < 0 else args.at
+    # el segmento que lo contiene es el último que empezó antes de 'ts'
+    starts = [int(os.path.basename(base)[4:]) / 1000 for base in segments]
+    k = max(bisect_right(starts, ts) - 1, 0) if segments else -1
+    if k < 0:
+        raise SystemExit("no recordings")
+    reader = SegmentReader(segments[k])
+    if not len(reader):
+        raise SystemExit("segment has no frames")
+    entry, jpeg = reader.frame(reader.nearest(ts))
+    with open(args.output, "wb") as f:
+        f.write(jpeg)
+    jpeg.release()
+    reader.close()
+    print(f"seq {entry.seq} at {entry.ts:.3f} ({entry.length} bytes) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
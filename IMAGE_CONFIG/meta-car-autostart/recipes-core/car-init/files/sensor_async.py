@@ -0,0 +1,122 @@
+# sensor_async.py
+import asyncio
+from collections import deque
+from async_http import HTTPServer, json_response
+from sensor_sampler import buffered_reading, sse_event
+
+SSE_KEEPALIVE = 15.0
+
+
+class _AsyncSubscription:
+    """Broadcaster subscriber that wakes an event-loop task instead of a thread."""
+
+    def __init__(self, loop, size=32):
+        self.loop = loop
+        self.queue = deque(maxlen=size)
+        self.event = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, event):
+        # sampler thread: the deque is thread-safe, the wakeup goes through the loop
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(event)
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def get(self, timeout):
+        """Pending events (oldest first), or None on timeout."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.event.clear()
+        events = []
+        while self.queue:
+            events.append(self.queue.popleft())
+        return events
+
+
+def _optional(args, name, cast):
+    value = args.get(name)
+    return cast(value) if value not in (None, "") else None
+
+
+def build_app(sensors, sampler, buffer, broadcaster, queue_size=32):
+    """Ultrasonic routes of apiUltrasonic.py on async_http, for the unified runtime."""
+    app = HTTPServer()
+
+    def reading(name, **window):
+        return buffered_reading(buffer, sensors[name], name, **window)
+
+    @app.route("/")
+    async def index(request):
+        return json_response({
+            "status": "ok",
+            "message": "Dual Ultrasonic Sensor API (fault-tolerant) active",
+            "endpoints": ["/sensors", "/sensor/<name>", "/sensor/<name>/average",
+                          "/status", "/stream"]
+        })
+
+    @app.route("/sensors")
+    async def all_sensors(request):
+        samples = int(request.args.get("samples", 5))
+        max_age_ms = _optional(request.args, "max_age_ms", float)
+        return json_response({name: reading(name, samples=samples, max_age_ms=max_age_ms)
+                              for name in sensors})
+
+    @app.route("/sensor/<name>")
+    async def sensor_distance(request, name):
+        if name not in sensors:
+            return json_response({"error": f"Sensor '{name}' not found"}, 404)
+        result = reading(name, samples=1, max_age_ms=_optional(request.args, "max_age_ms", float))
+        return json_response(dict(result, sensor=name))
+
+    @app.route("/sensor/<name>/average")
+    async def sensor_average(request, name):
+        if name not in sensors:
+            return json_response({"error": f"Sensor '{name}' not found"}, 404)
+        window_ms = _optional(request.args, "window_ms", float)
+        samples = _optional(request.args, "samples", int)
+        if samples is None and window_ms is None:
+            samples = 5
+        result = reading(name, samples=samples, window_ms=window_ms,
+                         max_age_ms=_optional(request.args, "max_age_ms", float))
+        return json_response(dict(result, sensor=name))
+
+    @app.route("/status")
+    async def status(request):
+        latest = sampler.get_latest()
+        return json_response({
+            "latest_distances_cm": {
+                name: round(sample.distance_cm, 2) if sample.distance_cm is not None else 0.0
+                for name, sample in latest.items()
+            },
+            "samples": {
+                name: {"status": sample.status, "timestamp": sample.timestamp,
+                       "filtered_cm": sample.filtered_cm, "velocity_cms": sample.velocity_cms,
+                       "ttc_s": sample.ttc_s}
+                for name, sample in latest.items()
+            },
+            "rate_hz": round(1.0 / sampler.period, 2),
+            "running": sampler.running
+        })
+
+    @app.route("/stream")
+    async def stream(request):
+        sub = broadcaster.subscribe(_AsyncSubscription(asyncio.get_running_loop(), queue_size))
+        writer = request.writer
+        try:
+            request.write_head(200, "text/event-stream",
+                               {"Cache-Control": "no-cache", "Connection": "close"})
+            writer.write(b"retry: 1000\n\n")
+            while True:
+                await writer.drain()
+                events = await sub.get(SSE_KEEPALIVE)
+                if events is None:
+                    writer.write(b": keepalive\n\n")
+                elif events:
+                    writer.write("".join(sse_event(seq, s) for seq, s in events).encode())
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return app
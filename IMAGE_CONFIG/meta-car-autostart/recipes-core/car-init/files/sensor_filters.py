@@ -0,0 +1,123 @@
+# sensor_filters.py
+import bisect
+from collections import deque, namedtuple
+
+# Output of FilterPipeline.update(); velocity < 0 means the obstacle is closing in
+Filtered = namedtuple("Filtered", "distance_cm velocity_cms ttc_s")
+
+
+class RollingMedian:
+    """Median of the last 'size' values; one bisect insert/remove per sample."""
+
+    def __init__(self, size=3):
+        self.size = size
+        self.window = deque()
+        self.ordered = []
+
+    def update(self, value):
+        self.window.append(value)
+        bisect.insort(self.ordered, value)
+        if len(self.window) > self.size:
+            old = self.window.popleft()
+            del self.ordered[bisect.bisect_left(self.ordered, old)]
+        n = len(self.ordered)
+        mid = n // 2
+        return self.ordered[mid] if n % 2 else (self.ordered[mid - 1] + self.ordered[mid]) / 2
+
+    def reset(self):
+        self.window.clear()
+        self.ordered.clear()
+
+
+class EMA:
+    """Exponential moving average, O(1) per sample."""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, value):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def reset(self):
+        self.value = None
+
+
+class Kalman1D:
+    """
+    Constant-velocity Kalman filter on distance. State is (distance, velocity);
+    accel_std models how hard the relative speed can change between samples.
+    """
+
+    def __init__(self, meas_std=1.0, accel_std=200.0, max_gap=1.0):
+        self.r = meas_std ** 2
+        self.q = accel_std ** 2
+        self.max_gap = max_gap
+        self.reset()
+
+    def reset(self):
+        self.t = None
+        self.d = self.v = 0.0
+        self.p00 = self.p01 = self.p10 = self.p11 = 0.0
+
+    def update(self, z, t):
+        """Fold in measurement z (cm) taken at monotonic time t (s); returns (d, v)."""
+        if self.t is None or t - self.t > self.max_gap:
+            # first sample or a long gap: restart with unknown velocity
+            self.t, self.d, self.v = t, z, 0.0
+            self.p00, self.p01, self.p10, self.p11 = self.r, 0.0, 0.0, 1e4
+            return self.d, self.v
+
+        dt = max(t - self.t, 1e-6)
+        self.t = t
+
+        # predict
+        self.d += self.v * dt
+        q = self.q
+        p00 = self.p00 + dt * (self.p10 + self.p01) + dt * dt * self.p11 + q * dt ** 4 / 4
+        p01 = self.p01 + dt * self.p11 + q * dt ** 3 / 2
+        p10 = self.p10 + dt * self.p11 + q * dt ** 3 / 2
+        p11 = self.p11 + q * dt * dt
+
+        # update
+        s = p00 + self.r
+        k0, k1 = p00 / s, p10 / s
+        y = z - self.d
+        self.d += k0 * y
+        self.v += k1 * y
+        self.p00, self.p01 = (1 - k0) * p00, (1 - k0) * p01
+        self.p10, self.p11 = p10 - k1 * p00, p11 - k1 * p01
+        return self.d, self.v
+
+
+class FilterPipeline:
+    """
+    Per-sensor streaming filter: rolling median to drop outliers, then either
+    a Kalman filter (distance + closing velocity) or a plain EMA.
+    """
+
+    def __init__(self, median_size=3, ema_alpha=None, kalman=True, min_closing_cms=1.0):
+        self.median = RollingMedian(median_size) if median_size > 1 else None
+        self.ema = EMA(ema_alpha) if ema_alpha else None
+        self.kalman = Kalman1D() if kalman else None
+        self.min_closing_cms = min_closing_cms
+
+    def update(self, distance_cm, t):
+        """Feed one raw reading (None = no echo); returns Filtered or None."""
+        if distance_cm is None:
+            return None
+        value = self.median.update(distance_cm) if self.median else distance_cm
+        if self.ema:
+            value = self.ema.update(value)
+        velocity = None
+        if self.kalman:
+            value, velocity = self.kalman.update(value, t)
+
+        ttc = None
+        if velocity is not None and velocity < -self.min_closing_cms:
+            ttc = value / -velocity
+        return Filtered(value, velocity, ttc)
@@ -0,0 +1,120 @@
+# speed_governor.py
+import os
+import threading
+import time
+
+# Distancia (cm) a la que se corta la tracción y a la que empieza a limitarse
+GOV_STOP_CM = float(os.getenv("GOV_STOP_CM", "25"))
+GOV_SLOW_CM = float(os.getenv("GOV_SLOW_CM", "100"))
+# Tiempo a colisión (s) al que se corta y al que empieza a limitarse
+GOV_TTC_STOP = float(os.getenv("GOV_TTC_STOP", "0.6"))
+GOV_TTC_SLOW = float(os.getenv("GOV_TTC_SLOW", "2.0"))
+# Duty mínimo dentro de la zona de frenado (por debajo el motor no mueve el carro)
+GOV_MIN_DUTY = float(os.getenv("GOV_MIN_DUTY", "25"))
+# Si el sensor de un sentido deja de publicar, ese sentido queda limitado a esto.
+# Un timeout no cuenta: el HC-SR04 no tiene eco con nada dentro de ~4 m
+GOV_STALE_S = float(os.getenv("GOV_STALE_S", "0.5"))
+GOV_STALE_CAP = float(os.getenv("GOV_STALE_CAP", "50"))
+
+# sensor -> sentido de tracción que protege
+SENSOR_DIRECTIONS = {"front": "forward", "rear": "backward"}
+
+
+def _ramp(value, stop, slow, min_duty):
+    """0 en 'stop' o menos, 100 desde 'slow', lineal entre min_duty y 100 en el medio."""
+    if value <= stop:
+        return 0.0
+    if value >= slow:
+        return 100.0
+    return min_duty + (100.0 - min_duty) * (value - stop) / (slow - stop)
+
+
+class SpeedGovernor:
+    """
+    Limita el duty de tracción según el sensor que mira hacia donde va el
+    carro: por distancia filtrada y por tiempo a colisión, lo que sea más
+    restrictivo. Recibe cada muestra del proceso de ultrasonido (SensorFeed)
+    y ajusta CarController.limit_speed() en el mismo momento, así que un
+    obstáculo frena al carro en una muestra, sin esperar un comando nuevo.
+    Solo limita el sentido del obstáculo: alejarse siempre está permitido.
+
+    'available' son los sensores detectados al arrancar: sus sentidos cuentan
+    como mudos desde start(). Con None (car_api.py no ve los sensores) un
+    sentido se vigila recién desde su primera muestra.
+    """
+
+    def __init__(self, car, directions=SENSOR_DIRECTIONS, available=None):
+        self.car = car
+        self.directions = directions
+        self.available = available
+        self.last_seen = {}
+        # on_sample corre en el hilo del feed/sampler y check_stale en el del scheduler
+        self.lock = threading.Lock()
+        self.timer = None
+        self.caps = {direction: 100.0 for direction in directions.values()}
+        self.interventions = 0
+
+    def cap_for(self, sample):
+        if not sample.ok:
+            return 100.0   # sin eco: nada dentro del alcance
+        distance = sample.filtered_cm if sample.filtered_cm is not None else sample.distance_cm
+        cap = _ramp(distance, GOV_STOP_CM, GOV_SLOW_CM, GOV_MIN_DUTY)
+        if sample.ttc_s is not None:
+            cap = min(cap, _ramp(sample.ttc_s, GOV_TTC_STOP, GOV_TTC_SLOW, GOV_MIN_DUTY))
+        return cap
+
+    def on_sample(self, sample):
+        """Callback de SensorFeedReceiver (hilo del feed)."""
+        direction = self.directions.get(sample.name)
+        if direction is None:
+            return
+        with self.lock:
+            self.last_seen[direction] = sample.monotonic
+            self._set(direction, self.cap_for(sample))
+
+    def start(self):
+        """Revisa sensores mudos con un timer del scheduler del carro (sin hilo propio)."""
+        # un sensor detectado que nunca publica también cuenta como mudo desde el arranque
+        now = time.monotonic()
+        with self.lock:
+            for name in self.available or ():
+                if name in self.directions:
+                    self.last_seen.setdefault(self.directions[name], now)
+        self._arm()
+
+    def _arm(self):
+        self.timer = self.car.scheduler.call_later(GOV_STALE_S, self._tick,
+                                                   on_error=self._timer_failed)
+
+    def _timer_failed(self, timer):
+        # el scheduler descartó el timer: re-armar, o los sensores mudos dejarían de vigilarse
+        if self.timer is timer:
+            self._arm()
+
+    def _tick(self, deadline):
+        self.check_stale()
+        return deadline + GOV_STALE_S / 2
+
+    def check_stale(self):
+        """Limita los sentidos cuyo sensor dejó de publicar."""
+        now = time.monotonic()
+        with self.lock:
+            for direction, seen in self.last_seen.items():
+                if now - seen > GOV_STALE_S and self.caps[direction] > GOV_STALE_CAP:
+                    self._set(direction, GOV_STALE_CAP)
+
+    def _set(self, direction, cap):
+        # llamado con self.lock tomado
+        cap = round(cap)
+        if cap == self.caps[direction]:
+            return
+        if cap < self.caps[direction] and cap < 100:
+            self.interventions += 1
+        self.caps[direction] = cap
+        self.car.limit_speed(direction, cap)
+
+    def status(self):
+        now = time.monotonic()
+        with self.lock:
+            return {"caps": dict(self.caps), "interventions": self.interventions,
+                    "age_ms": {d: round((now - t) * 1000, 1) for d, t in self.last_seen.items()}}
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# state_bus.py
+"""
+Bus de estado compartido entre car_api.py, apiCamera.py y apiUltrasonic.py:
+un archivo en /dev/shm con layout fijo, mapeado por cada proceso.
+
+Cada sección tiene un solo escritor (un proceso) y un contador seqlock:
+impar mientras se escribe, par cuando está estable. El lector copia la
+sección y repite si el contador cambió en el medio, así que leer no toma
+locks ni bloquea al escritor y cuesta unos microsegundos.
+
+    python3 state_bus.py            # estado actual en JSON
+    python3 state_bus.py --watch    # refrescar cada 0.5 s
+    python3 state_bus.py --bench    # costo de una lectura
+"""
+import argparse, fcntl, json, mmap, os, struct, threading, time
+from collections import namedtuple
+
+STATE_BUS_PATH = os.getenv("STATE_BUS_PATH", "/dev/shm/car-state")
+
+MAGIC = b"CARSTATE"
+VERSION = 1
+MAX_SENSORS = 4
+
+# magic 8s | versión u32 | tamaño total u32
+HEADER = struct.Struct("<8sII")
+# contador seqlock al inicio de cada sección (u32: un store atómico también en ARM de 32 bits)
+_SEQ = struct.Struct("<I")
+_SEQ_SIZE = 8
+# cada sección en su propia línea de caché: escritores de procesos distintos no se pisan
+_ALIGN = 64
+
+# tracción: throttle i8 | steering i8 | duty tracción u8 | duty steering u8 | luces u8
+#           | tope adelante u8 | tope atrás u8 | watchdog armado u8 | monotonic f64
+CAR_RECORD = struct.Struct("<bbBBBBBBd")
+# cámara: seq u64 | hora de captura f64 | bytes u32 | pad | monotonic f64
+CAMERA_RECORD = struct.Struct("<QdI4xd")
+# sensor: nombre 8s | ok u8 | pad | distancia, filtrada, velocidad, ttc f32 (NaN = sin dato) | monotonic f64
+SENSOR_RECORD = struct.Struct("<8sB3xffffd")
+
+CarState = namedtuple("CarState", "throttle steering traction_duty steering_duty lights "
+                                  "cap_forward cap_backward watchdog_armed monotonic")
+CameraState = namedtuple("CameraState", "seq ts size monotonic")
+SensorState = namedtuple("SensorState", "name ok distance_cm filtered_cm velocity_cms ttc_s monotonic")
+
+_NAN = float("nan")
+
+
+def _section_size(record):
+    return -(-(_SEQ_SIZE + record.size) // _ALIGN) * _ALIGN
+
+
+CAR_OFFSET = _ALIGN
+CAMERA_OFFSET = CAR_OFFSET + _section_size(CAR_RECORD)
+SENSORS_OFFSET = CAMERA_OFFSET + _section_size(CAMERA_RECORD)
+SENSOR_STRIDE = _section_size(SENSOR_RECORD)
+BUS_SIZE = SENSORS_OFFSET + MAX_SENSORS * SENSOR_STRIDE
+
+
+def _f(value):
+    return _NAN if value is None else value
+
+
+def _opt(value):
+    return None if value != value else value
+
+
+def _clamp(value, low, high):
+    # entero dentro del rango del campo (NaN/None quedan en 0)
+    try:
+        return max(low, min(high, round(value)))
+    except (TypeError, ValueError):
+        return 0
+
+
+class StateBus:
+    """
+    Vista de un proceso sobre el bus. Los publish_* escriben la sección propia
+    (cualquier proceso puede leer todas); un lock local serializa a los hilos
+    del mismo proceso para que la sección tenga un único escritor.
+
+    No hay barreras de memoria explícitas (Python no las expone): la relectura
+    del contador cubre lo que se ve en la práctica, pero el bus es para
+    telemetría y paneles; las decisiones de seguridad usan sus propios canales
+    (SensorFeed para el governor).
+    """
+
+    def __init__(self, path=STATE_BUS_PATH):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o664)
+        try:
+            # entre procesos: dos que arrancan juntos no inicializan ni borran a la vez
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < BUS_SIZE:
+                    os.ftruncate(fd, BUS_SIZE)
+                self.map = mmap.mmap(fd, BUS_SIZE)
+                if HEADER.unpack_from(self.map, 0) != (MAGIC, VERSION, BUS_SIZE):
+                    # archivo nuevo o de otra versión: todos los procesos se actualizan juntos
+                    self.map[:BUS_SIZE] = bytes(BUS_SIZE)
+                    HEADER.pack_into(self.map, 0, MAGIC, VERSION, BUS_SIZE)
+            finally:
+                # explícito: mmap duplica el fd, y cerrar el nuestro no soltaría el flock
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+        self.lock = threading.Lock()
+        self.sensor_slots = {}
+        self.dropped = 0
+
+    # --- escritura (seqlock) ---
+    def _write(self, offset, record, *values):
+        with self.lock:
+            seq = _SEQ.unpack_from(self.map, offset)[0]
+            seq = (seq + 1) | 1   # impar: escribiendo (también si un escritor murió a mitad)
+            _SEQ.pack_into(self.map, offset, seq & 0xFFFFFFFF)
+            record.pack_into(self.map, offset + _SEQ_SIZE, *values)
+            # par y nunca 0 (0 = sección sin datos)
+            _SEQ.pack_into(self.map, offset, (seq + 1) & 0xFFFFFFFF or 2)
+
+    def publish_car(self, throttle, steering, traction_duty, steering_duty, lights,
+                    cap_forward=100, cap_backward=100, watchdog_armed=False):
+        # acotado al layout: la telemetría nunca debe tirar excepción en el lazo de control
+        self._write(CAR_OFFSET, CAR_RECORD, _clamp(throttle, -100, 100), _clamp(steering, -100, 100),
+                    _clamp(traction_duty, 0, 100), _clamp(steering_duty, 0, 100), lights & 0xFF,
+                    _clamp(cap_forward, 0, 100), _clamp(cap_backward, 0, 100),
+                    bool(watchdog_armed), time.monotonic())
+
+    def publish_frame(self, frame, seq, ts):
+        """Listener de CameraStream: callback(frame, seq, ts)."""
+        self._write(CAMERA_OFFSET, CAMERA_RECORD, seq, ts, len(frame), time.monotonic())
+
+    def publish_sensor(self, sample):
+        """Listener de SensorSampler: una sección por sensor, asignada por nombre."""
+        slot = self.sensor_slots.get(sample.name)
+        if slot is None:
+            slot = self._claim_slot(sample.name)
+            if slot is None:
+                self.dropped += 1
+                return
+        self._write(SENSORS_OFFSET + slot * SENSOR_STRIDE, SENSOR_RECORD,
+                    sample.name.encode()[:8], sample.status == "ok", _f(sample.distance_cm),
+                    _f(sample.filtered_cm), _f(sample.velocity_cms), _f(sample.ttc_s),
+                    sample.monotonic)
+
+    def _claim_slot(self, name):
+        # el mismo slot que usó este sensor antes de un reinicio, o el primero libre
+        key = name.encode()[:8].ljust(8, b"\0")
+        names = [SENSOR_RECORD.unpack_from(self.map, SENSORS_OFFSET + i * SENSOR_STRIDE + _SEQ_SIZE)[0]
+                 for i in range(MAX_SENSORS)]
+        for wanted in (key, b"\0" * 8):
+            if wanted in names:
+                slot = names.index(wanted)
+                self.sensor_slots[name] = slot
+                return slot
+        return None
+
+    # --- lectura (sin locks, desde cualquier proceso) ---
+    def _read(self, offset, record, retries=100):
+        for _ in range(retries):
+            seq = _SEQ.unpack_from(self.map, offset)[0]
+            if seq & 1:
+                continue
+            values = record.unpack_from(self.map, offset + _SEQ_SIZE)
+            if _SEQ.unpack_from(self.map, offset)[0] == seq:
+                return values if seq else None
+        return None   # escritor trabado a mitad (proceso muerto): sin dato
+
+    def car(self):
+        values = self._read(CAR_OFFSET, CAR_RECORD)
+        if values is None:
+            return None
+        state = CarState(*values)
+        return state._replace(watchdog_armed=bool(state.watchdog_armed))
+
+    def camera(self):
+        values = self._read(CAMERA_OFFSET, CAMERA_RECORD)
+        return CameraState(*values) if values else None
+
+    def sensors(self):
+        result = {}
+        for i in range(MAX_SENSORS):
+            values = self._read(SENSORS_OFFSET + i * SENSOR_STRIDE, SENSOR_RECORD)
+            if values is None:
+                continue
+            name, ok, dist, filt, vel, ttc, mono = values
+            name = name.rstrip(b"\0").decode()
+            result[name] = SensorState(name, bool(ok), _opt(dist), _opt(filt), _opt(vel), _opt(ttc), mono)
+        return result
+
+    def snapshot(self):
+        """Todo el bus como dict serializable, con la edad de cada sección en ms."""
+        now = time.monotonic()
+
+        def entry(state):
+            if state is None:
+                return None
+            data = state._asdict()
+            data["age_ms"] = round((now - data.pop("monotonic")) * 1000, 1)
+            return data
+
+        return {"car": entry(self.car()), "camera": entry(self.camera()),
+                "sensors": {name: entry(s) for name, s in self.sensors().items()}}
+
+    def close(self):
+        self.map.close()
+
+
+def open_state_bus(path=STATE_BUS_PATH):
+    """StateBus, o None si no se puede crear (sin /dev/shm): el bus es opcional."""
+    try:
+        return StateBus(path)
+    except OSError as e:
+        print(f"[WARN] State bus no disponible en {path}: {e}")
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path", nargs="?", default=STATE_BUS_PATH)
+    ap.add_argument("--watch", action="store_true")
+    ap.add_argument("--bench", action="store_true", help="medir el costo de leer el bus")
+    args = ap.parse_args()
+    bus = StateBus(args.path)
+
+    if args.bench:
+        for name, read in (("car", bus.car), ("camera", bus.camera), ("sensors", bus.sensors),
+                           ("snapshot", bus.snapshot)):
+            n = 20000
+            t0 = time.perf_counter()
+            for _ in range(n):
+                read()
+            print(f"{name:9s} {(time.perf_counter() - t0) / n * 1e6:7.2f} us/lectura")
+        return
+
+    while True:
+        print(json.dumps(bus.snapshot(), indent=2))
+        if not args.watch:
+            break
+        time.sleep(0.5)
+
+
+if __name__ == "__main__":
+    main()
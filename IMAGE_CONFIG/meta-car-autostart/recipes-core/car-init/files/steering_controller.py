@@ -0,0 +1,207 @@
+# steering_controller.py
+import os
+import time
+
+# Posición del steering: -100 (tope izquierdo) .. 100 (tope derecho), 0 = centro
+# Recorrido por segundo a duty 100, para estimar la posición sin sensor
+STEER_RATE = float(os.getenv("STEER_RATE_PCT_S", "400"))
+# Periodo del lazo en el scheduler PWM y error aceptado como "llegó"
+STEER_TICK = float(os.getenv("STEER_TICK_MS", "20")) / 1000.0
+STEER_DEADBAND = float(os.getenv("STEER_DEADBAND", "3"))
+# Sin sensor, al pedir un tope se empuja esto de más para asegurar que llegó
+STEER_END_OVERDRIVE = float(os.getenv("STEER_END_OVERDRIVE", "15"))
+
+# Sensor de posición opcional: atributo sysfs de un ADC IIO (p. ej. un potenciómetro
+# en el eje) con sus lecturas crudas en los dos topes
+STEER_FEEDBACK = os.getenv("STEER_FEEDBACK", "")
+STEER_FB_LEFT = float(os.getenv("STEER_FB_LEFT", "0"))
+STEER_FB_RIGHT = float(os.getenv("STEER_FB_RIGHT", "4095"))
+# Ganancias PID (solo con sensor); salida = duty con signo
+STEER_KP = float(os.getenv("STEER_KP", "2.0"))
+STEER_KI = float(os.getenv("STEER_KI", "0.0"))
+STEER_KD = float(os.getenv("STEER_KD", "0.05"))
+
+
+def _clamp(value, limit=100.0):
+    return max(-limit, min(limit, value))
+
+
+class AnalogPosition:
+    """Posición leída de un atributo sysfs (in_voltageN_raw de IIO), escalada a -100..100."""
+
+    def __init__(self, path, raw_left=STEER_FB_LEFT, raw_right=STEER_FB_RIGHT):
+        self.path = path
+        self.raw_left = raw_left
+        self.raw_right = raw_right
+        self.fd = os.open(path, os.O_RDONLY)
+        self.errors = 0
+
+    def read(self):
+        try:
+            raw = float(os.pread(self.fd, 32, 0))
+        except (OSError, ValueError):
+            self.errors += 1
+            return None
+        return _clamp((raw - self.raw_left) / (self.raw_right - self.raw_left) * 200.0 - 100.0)
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_feedback(path=STEER_FEEDBACK):
+    """AnalogPosition si STEER_FEEDBACK está configurado y se puede abrir; si no None (lazo abierto)."""
+    if not path:
+        return None
+    try:
+        return AnalogPosition(path)
+    except OSError as e:
+        print(f"[WARN] Sensor de steering no disponible ({e}); lazo abierto")
+        return None
+
+
+class SteeringController:
+    """
+    Dueño único del motor de steering: guarda una posición objetivo absoluta
+    y un solo timer del scheduler PWM la persigue cada 'tick' mandando el duty
+    al MotionProfile del steering. Un objetivo nuevo reemplaza al anterior, así
+    que no hay pulsos superpuestos peleando por in3/in4.
+
+    Con sensor (AnalogPosition) corre un PID sobre la posición medida y
+    sostiene la posición mientras haya objetivo. Sin sensor la posición se
+    estima integrando el duty aplicado a 'rate' %/s; la salida es
+    proporcional al error para frenar justo en el último tick, y los topes se
+    piden con 'overdrive' de más para re-sincronizar la estimación.
+
+    Comparte el lock del CarController: set_target()/halt() se llaman con él tomado.
+    """
+
+    def __init__(self, profile, scheduler, lock, feedback=None, rate=STEER_RATE,
+                 tick=STEER_TICK, deadband=STEER_DEADBAND, overdrive=STEER_END_OVERDRIVE,
+                 kp=STEER_KP, ki=STEER_KI, kd=STEER_KD, on_change=None):
+        self.profile = profile
+        self.scheduler = scheduler
+        self.lock = lock
+        self.feedback = feedback
+        self.rate = rate
+        self.tick = tick
+        self.deadband = deadband
+        self.overdrive = overdrive
+        self.kp, self.ki, self.kd = kp, ki, kd
+        self.on_change = on_change
+        self.target = 0.0
+        self.estimate = 0.0       # sin sensor: se asume centrado al arrancar (home() lo asegura)
+        self.position = None
+        self.timer = None
+        self.last_tick = 0.0
+        self.integral = 0.0
+        self.prev_error = None
+        self.homing = False
+        self.moves = 0
+
+    def set_target(self, position):
+        # llamado con self.lock tomado; reemplaza cualquier objetivo pendiente
+        self.target = _clamp(float(position))
+        self.homing = False
+        self._arm()
+
+    def nudge(self, delta):
+        """Corrimiento relativo del objetivo (steer() con pulso): lo que recorrería en 'delta' unidades."""
+        self.set_target(self.target + delta)
+
+    def home(self):
+        # sin sensor: recorrido completo contra el tope izquierdo y vuelta al centro
+        if self.feedback is not None:
+            return
+        self.estimate = 100.0
+        self.target = -100.0
+        self.homing = True
+        self._arm()
+
+    def halt(self):
+        # llamado con self.lock tomado: motor parado ya; la estimación queda donde está
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.profile.halt()
+        self.estimate = _clamp(self.estimate)
+        self.integral = 0.0
+        self.prev_error = None
+
+    def _arm(self):
+        if self.timer is None:
+            self.moves += 1
+            self.last_tick = time.monotonic()
+            self.prev_error = None
+            self.timer = self.scheduler.call_at(self.last_tick, self._tick,
+                                                on_error=self._timer_failed)
+
+    def _timer_failed(self, timer):
+        # el scheduler descartó el timer: motor suelto y el próximo objetivo lo vuelve a armar
+        with self.lock:
+            if self.timer is timer:
+                self.timer = None
+                self.profile.set_target(0)
+
+    def _goal(self):
+        # sin sensor, los topes se piden de más: el mecanismo frena solo y la estimación se re-sincroniza
+        if self.feedback is None and abs(self.target) >= 100:
+            return self.target + (self.overdrive if self.target > 0 else -self.overdrive)
+        return self.target
+
+    def _read_position(self, dt):
+        if self.feedback is not None:
+            return self.feedback.read()
+        self.estimate += self.profile.direction * self.profile.duty / 100.0 * self.rate * dt
+        return self.estimate
+
+    def _tick(self, deadline):
+        with self.lock:
+            if self.timer is None:
+                return None
+            now = time.monotonic()
+            dt, self.last_tick = now - self.last_tick, now
+            self.position = self._read_position(dt)
+            if self.position is None:
+                # sensor caído: soltar el motor y reintentar en el próximo tick
+                self.profile.set_target(0)
+                return max(deadline + self.tick, now)
+
+            error = self._goal() - self.position
+            if abs(error) <= self.deadband:
+                self.profile.set_target(0)
+                self.integral = 0.0
+                if self.on_change is not None:
+                    self.on_change()
+                if self.feedback is not None:
+                    return max(deadline + self.tick, now)   # con sensor sostiene la posición
+                self.estimate = _clamp(self.estimate)
+                self.timer = None
+                if self.homing:
+                    self.homing = False
+                    self.target = 0.0
+                    self._arm()
+                return None
+
+            if self.feedback is not None:
+                output = self._pid(error, dt)
+            else:
+                # a pleno hasta el último tick; ahí lo justo para llegar sin pasarse
+                output = error / (self.rate * self.tick) * 100.0
+            self.profile.set_target(round(_clamp(output)))
+            if self.on_change is not None:
+                self.on_change()
+            return max(deadline + self.tick, now)
+
+    def _pid(self, error, dt):
+        if self.ki:
+            self.integral = _clamp(self.integral + error * dt, 100.0 / self.ki)
+        derivative = (error - self.prev_error) / dt if self.prev_error is not None and dt > 0 else 0.0
+        self.prev_error = error
+        return self.kp * error + self.ki * self.integral + self.kd * derivative
+
+    def status(self):
+        return {"target": round(self.target, 1),
+                "position": round(self.position, 1) if self.position is not None else None,
+                "estimate": round(self.estimate, 1) if self.feedback is None else None,
+                "feedback": self.feedback.path if self.feedback else None,
+                "active": self.timer is not None, "homing": self.homing, "moves": self.moves}
@@ -1,22 +1,317 @@
-
 import ctypes
+import fcntl
+import os
+import select
+import time
 
-# Carga la librería instalada por la receta C
-lib = ctypes.CDLL("/usr/lib/libgpio.so")
+# Raíz de sysfs y offset del gpiochip (en kernels 6.x de la Pi 4 los pines BCM empiezan en 512)
+GPIO_SYSFS_ROOT = os.getenv("GPIO_SYSFS_ROOT", "/sys/class/gpio")
+GPIO_BASE = int(os.getenv("GPIO_BASE", "512"))
+# "fd": descriptor persistente por pin (por defecto), "lib": libgpio.so (un fork por escritura)
+GPIO_BACKEND = os.getenv("GPIO_BACKEND", "fd")
+# Character device usado por GPIOBank; vacío para forzar el backend por pin
+GPIO_CHIP = os.getenv("GPIO_CHIP", "/dev/gpiochip0")
+
+_lib = None
+
+
+def _load_lib():
+    """Carga la librería instalada por la receta C solo cuando se usa el backend 'lib'."""
+    global _lib
+    if _lib is None:
+        _lib = ctypes.CDLL("/usr/lib/libgpio.so")
+    return _lib
+
+
+class LibGPIO:
+    """Backend original: cada llamada pasa por libgpio.so (system("echo ...") en C)."""
 
-class GPIOAdapter:
     def __init__(self, bcm_pin):
         self.bcm_pin = bcm_pin
-        lib.gpio_export(bcm_pin)
+        self.lib = _load_lib()
+        self.lib.gpio_export(bcm_pin)
+
+    def set_direction(self, direction="out"):
+        self.lib.gpio_set_direction(self.bcm_pin, direction.encode('utf-8'))
+
+    def write(self, value: int):
+        self.lib.gpio_write(self.bcm_pin, value)
+
+    def read(self) -> int:
+        return self.lib.gpio_read(self.bcm_pin)
+
+    def set_edge(self, edge="both"):
+        raise OSError("libgpio no expone interrupciones por flanco")
+
+    def fileno(self):
+        raise OSError("libgpio no mantiene un descriptor abierto")
+
+    def cleanup(self):
+        self.lib.gpio_unexport(self.bcm_pin)
+
+
+class SysfsGPIO:
+    """
+    Backend sysfs sin forks: abre el archivo 'value' una sola vez y usa
+    pwrite/pread en el offset 0 para cada escritura/lectura.
+    """
+
+    _VALUES = (b"0", b"1")
+
+    def __init__(self, bcm_pin, root=None, base=None, export_timeout=1.0):
+        self.bcm_pin = bcm_pin
+        self.root = root or GPIO_SYSFS_ROOT
+        self.pin = (GPIO_BASE if base is None else base) + bcm_pin
+        self.pin_dir = os.path.join(self.root, f"gpio{self.pin}")
+        self.fd = None
+
+        if not os.path.isdir(self.pin_dir):
+            self._write_attr(os.path.join(self.root, "export"), str(self.pin))
+            # udev puede tardar un poco en crear el directorio del pin
+            deadline = time.monotonic() + export_timeout
+            while not os.path.isdir(self.pin_dir):
+                if time.monotonic() > deadline:
+                    raise OSError(f"GPIO {bcm_pin} no apareció en {self.pin_dir}")
+                time.sleep(0.01)
+
+    @staticmethod
+    def _write_attr(path, data):
+        fd = os.open(path, os.O_WRONLY)
+        try:
+            os.write(fd, data.encode())
+        finally:
+            os.close(fd)
+
+    def _value_fd(self):
+        if self.fd is None:
+            self.fd = os.open(os.path.join(self.pin_dir, "value"), os.O_RDWR)
+        return self.fd
+
+    def set_direction(self, direction="out"):
+        self._write_attr(os.path.join(self.pin_dir, "direction"), direction)
+
+    def write(self, value: int):
+        os.pwrite(self._value_fd(), self._VALUES[1 if value else 0], 0)
+
+    def read(self) -> int:
+        data = os.pread(self._value_fd(), 2, 0)
+        return 1 if data[:1] == b"1" else 0
+
+    def set_edge(self, edge="both"):
+        """Activa interrupciones: poll() sobre fileno() despierta con POLLPRI en cada flanco."""
+        self._write_attr(os.path.join(self.pin_dir, "edge"), edge)
+
+    def fileno(self):
+        return self._value_fd()
+
+    def cleanup(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        try:
+            self._write_attr(os.path.join(self.root, "unexport"), str(self.pin))
+        except OSError:
+            pass
+
+
+_BACKENDS = {"fd": SysfsGPIO, "lib": LibGPIO}
+
+
+class GPIOAdapter:
+    def __init__(self, bcm_pin, backend=None, root=None):
+        self.bcm_pin = bcm_pin
+        name = backend or GPIO_BACKEND
+        if name not in _BACKENDS:
+            raise ValueError(f"Backend GPIO desconocido: {name}")
+        if name == "fd":
+            self.backend = SysfsGPIO(bcm_pin, root=root)
+        else:
+            self.backend = LibGPIO(bcm_pin)
 
     def set_direction(self, direction="out"):
-        lib.gpio_set_direction(self.bcm_pin, direction.encode('utf-8'))
+        self.backend.set_direction(direction)
 
     def write(self, value: int):
-        lib.gpio_write(self.bcm_pin, value)
+        self.backend.write(value)
 
     def read(self) -> int:
-        return lib.gpio_read(self.bcm_pin)
+        return self.backend.read()
+
+    def set_edge(self, edge="both"):
+        self.backend.set_edge(edge)
+
+    def fileno(self):
+        return self.backend.fileno()
+
+    def cleanup(self):
+        self.backend.cleanup()
+
+
+# --- GPIO character device (uAPI v2, linux/gpio.h) ---
+GPIO_V2_LINES_MAX = 64
+GPIO_V2_LINE_FLAG_INPUT = 1 << 2
+GPIO_V2_LINE_FLAG_OUTPUT = 1 << 3
+GPIO_V2_LINE_FLAG_EDGE_RISING = 1 << 4
+GPIO_V2_LINE_FLAG_EDGE_FALLING = 1 << 5
+GPIO_V2_LINE_EVENT_RISING_EDGE = 1
+
+
+class _LineAttribute(ctypes.Structure):
+    _fields_ = [("id", ctypes.c_uint32), ("padding", ctypes.c_uint32),
+                ("value", ctypes.c_uint64)]
+
+
+class _LineConfigAttribute(ctypes.Structure):
+    _fields_ = [("attr", _LineAttribute), ("mask", ctypes.c_uint64)]
+
+
+class _LineConfig(ctypes.Structure):
+    _fields_ = [("flags", ctypes.c_uint64), ("num_attrs", ctypes.c_uint32),
+                ("padding", ctypes.c_uint32 * 5),
+                ("attrs", _LineConfigAttribute * 10)]
+
+
+class _LineRequest(ctypes.Structure):
+    _fields_ = [("offsets", ctypes.c_uint32 * GPIO_V2_LINES_MAX),
+                ("consumer", ctypes.c_char * 32), ("config", _LineConfig),
+                ("num_lines", ctypes.c_uint32), ("event_buffer_size", ctypes.c_uint32),
+                ("padding", ctypes.c_uint32 * 5), ("fd", ctypes.c_int32)]
+
+
+class _LineValues(ctypes.Structure):
+    _fields_ = [("bits", ctypes.c_uint64), ("mask", ctypes.c_uint64)]
+
+
+class _LineEvent(ctypes.Structure):
+    _fields_ = [("timestamp_ns", ctypes.c_uint64), ("id", ctypes.c_uint32),
+                ("offset", ctypes.c_uint32), ("seqno", ctypes.c_uint32),
+                ("line_seqno", ctypes.c_uint32), ("padding", ctypes.c_uint32 * 6)]
+
+
+def _iowr(nr, struct):
+    return (3 << 30) | (ctypes.sizeof(struct) << 16) | (0xB4 << 8) | nr
+
+
+GPIO_V2_GET_LINE_IOCTL = _iowr(0x07, _LineRequest)
+GPIO_V2_LINE_GET_VALUES_IOCTL = _iowr(0x0E, _LineValues)
+GPIO_V2_LINE_SET_VALUES_IOCTL = _iowr(0x0F, _LineValues)
+
+
+class ChardevLines:
+    """
+    Grupo de líneas pedidas al gpiochip en una sola request. Todas las líneas
+    se leen/escriben con un único ioctl (bit i = i-ésima línea pedida).
+
+    Con flags de flanco (EDGE_RISING/EDGE_FALLING) el kernel encola eventos
+    con timestamp CLOCK_MONOTONIC que se leen con read_events().
+    """
+
+    def __init__(self, bcm_pins, chip=None, flags=GPIO_V2_LINE_FLAG_OUTPUT,
+                 consumer="car", event_buffer_size=0):
+        if not 0 < len(bcm_pins) <= GPIO_V2_LINES_MAX:
+            raise ValueError("Número de líneas inválido")
+        req = _LineRequest()
+        for i, pin in enumerate(bcm_pins):
+            req.offsets[i] = pin
+        req.num_lines = len(bcm_pins)
+        req.consumer = consumer.encode()[:31]
+        req.config.flags = flags
+        req.event_buffer_size = event_buffer_size
+        chip_fd = os.open(chip or GPIO_CHIP, os.O_RDWR | os.O_CLOEXEC)
+        try:
+            fcntl.ioctl(chip_fd, GPIO_V2_GET_LINE_IOCTL, req)
+        finally:
+            os.close(chip_fd)
+        self.fd = req.fd
+        self.num_lines = len(bcm_pins)
+        self.poller = None
+
+    def set_values(self, bits, mask):
+        fcntl.ioctl(self.fd, GPIO_V2_LINE_SET_VALUES_IOCTL, _LineValues(bits, mask))
+
+    def get_values(self, mask=None):
+        vals = _LineValues(0, (1 << self.num_lines) - 1 if mask is None else mask)
+        fcntl.ioctl(self.fd, GPIO_V2_LINE_GET_VALUES_IOCTL, vals)
+        return vals.bits
+
+    def read_events(self, timeout):
+        """Espera hasta 'timeout' s y devuelve [(timestamp_ns, rising), ...] (vacío si expira)."""
+        if self.poller is None:
+            self.poller = select.poll()
+            self.poller.register(self.fd, select.POLLIN)
+        if not self.poller.poll(max(0.0, timeout) * 1000.0):
+            return []
+        size = ctypes.sizeof(_LineEvent)
+        data = os.read(self.fd, size * 16)
+        events = []
+        for off in range(0, len(data) - size + 1, size):
+            ev = _LineEvent.from_buffer_copy(data, off)
+            events.append((ev.timestamp_ns, ev.id == GPIO_V2_LINE_EVENT_RISING_EDGE))
+        return events
+
+    def drain(self):
+        """Descarta eventos viejos encolados."""
+        while self.read_events(0):
+            pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class GPIOBank:
+    """
+    Conjunto de pines de salida con nombre que se escriben en bloque.
+
+    write_many({"in1": 1, "in2": 0}) aplica todos los cambios con un solo
+    GPIO_V2_LINE_SET_VALUES_IOCTL cuando el gpiochip está disponible; si no,
+    cae a un loop sobre los descriptores persistentes de GPIOAdapter.
+    """
+
+    def __init__(self, pins, backend=None, root=None, chip=None):
+        self.names = list(pins)
+        self.bits = {name: 1 << i for i, name in enumerate(self.names)}
+        self.lines = None
+        self.adapters = {}
+
+        chip = GPIO_CHIP if chip is None else chip
+        if chip and root is None and (backend or GPIO_BACKEND) == "fd":
+            try:
+                self.lines = ChardevLines([pins[n] for n in self.names], chip=chip)
+            except OSError as e:
+                print(f"[WARN] gpiochip no disponible ({e}); usando sysfs por pin")
+
+        if self.lines is None:
+            for name in self.names:
+                gpio = GPIOAdapter(pins[name], backend=backend, root=root)
+                gpio.set_direction("out")
+                self.adapters[name] = gpio
+
+    def __contains__(self, name):
+        return name in self.bits
+
+    def write(self, name, value: int):
+        self.write_many({name: value})
+
+    def write_many(self, values):
+        if self.lines is not None:
+            bits = mask = 0
+            for name, value in values.items():
+                bit = self.bits[name]
+                mask |= bit
+                if value:
+                    bits |= bit
+            self.lines.set_values(bits, mask)
+        else:
+            for name, value in values.items():
+                self.adapters[name].write(value)
+
+    def write_all(self, value: int):
+        self.write_many(dict.fromkeys(self.names, value))
 
     def cleanup(self):
-        lib.gpio_unexport(self.bcm_pin)
+        if self.lines is not None:
+            self.lines.close()
+        for gpio in self.adapters.values():
+            gpio.cleanup()
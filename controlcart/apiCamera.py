@@ -1,149 +1,107 @@
 #!/usr/bin/env python3
-import os, subprocess, threading, time
-from contextlib import suppress
-from flask import Flask, Response, jsonify
+import os
+from flask import Flask, Response, jsonify, request
+from car_config import CAMERA_PORT
+from camera_stream import CameraStream, index_html, clip_chunks, frame_headers
+from frame_ring import clip_bounds, find_frame
+from frame_sources import WIDTH, HEIGHT, FPS
+from segment_recorder import REC_ENABLED, SegmentRecorder
+from h264_stream import H264Stream
+from state_bus import open_state_bus
 
 app = Flask(__name__)
 
-WIDTH  = int(os.getenv("CAM_WIDTH",  "1280"))
-HEIGHT = int(os.getenv("CAM_HEIGHT", "720"))
-FPS    = int(os.getenv("CAM_FPS",    "30"))
+# "flask": un hilo por cliente (original); "async": fan-out asyncio (camera_async.py)
+CAM_SERVER = os.getenv("CAM_SERVER", "flask")
 
-class CameraStream:
-    def __init__(self):
-        self.proc = None
-        self.lock = threading.Lock()
-        self.cond = threading.Condition(self.lock)
-        self.latest = None       # último frame JPEG (bytes)
-        self.seq = 0             # contador de frames
-        self.pump_thread = None
-        self.running = False
-
-    def _start_proc(self):
-        cmd = [
-            "rpicam-vid",
-            "-t", "0",                    # infinito
-            "--codec", "mjpeg",
-            "--width", str(WIDTH),
-            "--height", str(HEIGHT),
-            "--framerate", str(FPS),
-            "--nopreview",
-            "-o", "-"                     # stdout
-        ]
-        self.proc = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0
-        )
-
-    def _pump(self):
-        """Lee stdout, separa JPEGs y publica el último a todos los clientes."""
-        buf = bytearray()
-        try:
-            while self.running and self.proc and self.proc.stdout:
-                chunk = self.proc.stdout.read(4096)
-                if not chunk:
-                    break
-                buf.extend(chunk)
-
-                # extrae todos los JPEG completos del buffer
-                while True:
-                    soi = buf.find(b"\xff\xd8")  # start of image
-                    if soi < 0:
-                        if len(buf) > 2_000_000:
-                            buf.clear()
-                        break
-                    eoi = buf.find(b"\xff\xd9", soi + 2)  # end of image
-                    if eoi < 0:
-                        if soi > 0:
-                            del buf[:soi]
-                        break
-
-                    frame = bytes(buf[soi:eoi+2])
-                    del buf[:eoi+2]
-                    with self.cond:
-                        self.latest = frame
-                        self.seq += 1
-                        self.cond.notify_all()
-        finally:
-            with suppress(Exception):
-                self.proc.terminate()
-            with suppress(Exception):
-                self.proc.wait(timeout=2)
-
-    def start(self):
-        with self.lock:
-            if self.running:
-                return
-            self.running = True
-            self._start_proc()
-            self.pump_thread = threading.Thread(target=self._pump, daemon=True)
-            self.pump_thread.start()
-
-    def stop(self):
-        with self.lock:
-            self.running = False
-        if self.pump_thread:
-            self.pump_thread.join(timeout=2)
-
-    def frames(self):
-        """
-        Generador para cada cliente: espera nuevos frames y los envía.
-        Todos leen del mismo 'latest' — soporta múltiples clientes.
-        """
-        self.start()
-        last = -1
-        while True:
-            with self.cond:
-                # espera un frame nuevo
-                if self.seq == last:
-                    self.cond.wait(timeout=2.0)
-                if self.latest is None:
-                    continue
-                frame = self.latest
-                last = self.seq
-            yield (b"--frame\r\n"
-                   b"Content-Type: image/jpeg\r\n"
-                   b"Content-Length: " + str(len(frame)).encode() + b"\r\n\r\n" +
-                   frame + b"\r\n")
+cam = CameraStream()
+h264 = H264Stream()   # pipeline H.264 (CAM_H264_CMD), arranca con su primer cliente
 
-    def get_snapshot(self, timeout=3.0):
-        """
-        Devuelve el último frame si existe; si no, espera a que llegue uno.
-        Evita lanzar rpicam-jpeg (que chocaría con el stream).
-        """
-        self.start()
-        t0 = time.time()
-        with self.cond:
-            while self.latest is None and (time.time() - t0) < timeout:
-                self.cond.wait(timeout=timeout)
-            return self.latest
+# seq/hora del último frame en el bus de estado compartido (/dev/shm)
+state_bus = open_state_bus()
+if state_bus:
+    cam.subscribe(state_bus.publish_frame)
 
-cam = CameraStream()
+# grabación continua en la SD (CAM_REC_DIR); mantiene la cámara encendida
+recorder = SegmentRecorder() if REC_ENABLED else None
 
 @app.get("/stream.mjpg")
 def stream_mjpg():
-    return Response(cam.frames(),
+    # ?fps=10&scale=0.5&quality=60 para enlaces lentos
+    fps = request.args.get("fps", type=float)
+    tier = cam.tiers.select(scale=request.args.get("scale", type=float),
+                            quality=request.args.get("quality", type=int))
+    return Response(cam.frames(fps=fps, tier=tier),
                     mimetype="multipart/x-mixed-replace; boundary=frame")
 
+@app.get("/stream.h264")
+def stream_h264():
+    # Annex-B crudo: empieza en el último keyframe (con SPS/PPS) y sigue en vivo
+    if h264.blocked_by(cam):
+        return jsonify(error="cámara en uso por el stream MJPEG"), 503
+    return Response(h264.units(), mimetype="video/h264",
+                    headers={"Cache-Control": "no-cache"})
+
+@app.get("/h264/stats")
+def h264_stats():
+    return jsonify(h264.stats())
+
 @app.get("/snapshot.jpg")
 def snapshot():
     img = cam.get_snapshot()
     if img is None:
         # no llegó ningún frame aún
         return Response("no frame", status=503)
-    return Response(img, mimetype="image/jpeg")
+    return Response(bytes(img), mimetype="image/jpeg")
+
+@app.get("/frame.jpg")
+def frame_at():
+    # ?t=<epoch> (negativo: segundos atrás) o ?seq=N, desde el ring en memoria
+    try:
+        frame = find_frame(cam.ring, request.args)
+    except ValueError:
+        return Response("bad t/seq", status=400)
+    if frame is None:
+        return Response("frame not in ring", status=404)
+    return Response(bytes(frame.data), mimetype="image/jpeg", headers=frame_headers(frame))
+
+@app.get("/clip.mjpg")
+def clip():
+    # ?start=&end= (epoch o negativos) o ?seconds=N; &format=raw -> JPEG concatenados
+    try:
+        start, end = clip_bounds(request.args)
+    except ValueError:
+        return Response("bad start/end", status=400)
+    frames = cam.ring.clip(start, end)
+    if not frames:
+        return Response("no frames in range", status=404)
+    if request.args.get("format") == "raw":
+        name = f"clip-{frames[0].seq}-{frames[-1].seq}.mjpeg"
+        return Response(clip_chunks(frames, raw=True), mimetype="video/x-motion-jpeg",
+                        headers={"Content-Length": str(sum(len(f.data) for f in frames)),
+                                 "Content-Disposition": f'attachment; filename="{name}"'})
+    return Response(clip_chunks(frames), mimetype="multipart/x-mixed-replace; boundary=frame")
 
 @app.get("/")
 def index():
-    return Response(f"""<!doctype html>
-<html><head><meta charset="utf-8"><title>RPi Camera</title></head>
-<body style="margin:0;background:#111;display:flex;align-items:center;justify-content:center;height:100vh">
-<img src="/stream.mjpg" style="max-width:100%;height:auto;border-radius:12px;box-shadow:0 10px 30px rgba(0,0,0,.5)">
-</body></html>""", mimetype="text/html")
+    return Response(index_html(), mimetype="text/html")
 
 @app.get("/healthz")
 def health():
-    return jsonify(ok=True, width=WIDTH, height=HEIGHT, fps=FPS, streaming=cam.running)
+    return jsonify(ok=True, width=WIDTH, height=HEIGHT, fps=FPS, streaming=cam.running,
+                   consumers=dict(cam.consumers),
+                   tiers=[t._asdict() for t in cam.tiers.tiers], ring=cam.ring.stats(),
+                   recorder=recorder.stats() if recorder else None)
 
 if __name__ == "__main__":
-    # Arranque lazy: empieza cuando llega el primer cliente
-    app.run(host="0.0.0.0", port=5001, threaded=True)
+    if recorder:
+        cam.subscribe(recorder.append)
+        recorder.start()
+        cam.acquire("recorder")   # el recorder es un consumidor permanente
+    # Arranque lazy: la captura corre mientras haya consumidores (y CAM_IDLE_TIMEOUT después)
+    if CAM_SERVER == "async":
+        import asyncio
+        from camera_async import serve
+        asyncio.run(serve(cam, host="0.0.0.0", port=CAMERA_PORT, h264=h264, recorder=recorder))
+    else:
+        app.run(host="0.0.0.0", port=CAMERA_PORT, threaded=True)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# bench_control.py
+"""
+Latencia del canal de control UDP: envía comandos a 'rate' Hz pidiendo ack y
+reporta RTT, tiempo del lado del carro (llegada del datagrama -> objetivo
+aceptado por CarController, medido con el timestamp del kernel) y la latencia
+comando -> aceptado estimada (RTT/2 + tiempo en el carro). No incluye la
+rampa de MotionProfile: el GPIO/PWM se escribe después, en el scheduler. Con --http compara contra POST /move del API Flask.
+
+    python3 bench_control.py --host car.local --rate 50 --seconds 10
+    python3 bench_control.py --host car.local --http --count 200
+"""
+import argparse, json, math, socket, time, urllib.request
+from control_channel import ACK, COMMAND, CONTROL_PORT, FLAG_ACK, FLAG_STOP, STATUS_APPLIED
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float("nan")
+
+
+def summary(name, values_ms):
+    print(f"{name:18s} " + "  ".join(f"p{p} {percentile(values_ms, p):7.3f}" for p in (50, 90, 99))
+          + f"  max {max(values_ms, default=float('nan')):7.3f} ms")
+
+
+def bench_udp(args):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(args.timeout)
+    addr = (args.host, args.port)
+    rtts, accepts, stale, lost = [], [], 0, 0
+    interval = 1.0 / args.rate
+    count = args.count or int(args.seconds * args.rate)
+    deadline = time.monotonic()
+    for i in range(count):
+        # una onda suave de throttle/steering, pequeña para no mover el carro de verdad
+        throttle = int(args.amplitude * math.sin(i / 25))
+        steering = int(args.amplitude * math.cos(i / 25))
+        seq = (args.seq_start + i) & 0xFFFFFFFF
+        t0 = time.perf_counter()
+        sock.sendto(COMMAND.pack(seq, throttle, steering, 0, FLAG_ACK), addr)
+        try:
+            while True:
+                ack_seq, status, accept_us = ACK.unpack(sock.recv(64))
+                if ack_seq == seq:
+                    break
+        except socket.timeout:
+            lost += 1
+        else:
+            rtts.append((time.perf_counter() - t0) * 1000)
+            if status == STATUS_APPLIED:
+                accepts.append(accept_us / 1000)
+            else:
+                stale += 1
+        deadline += interval
+        time.sleep(max(0.0, deadline - time.monotonic()))
+    sock.sendto(COMMAND.pack((args.seq_start + count) & 0xFFFFFFFF, 0, 0, 0, FLAG_STOP), addr)
+
+    print(f"udp: sent={count} acked={len(rtts)} lost={lost} stale={stale} rate={args.rate} Hz")
+    summary("rtt", rtts)
+    summary("car rx->accepted", accepts)
+    summary("cmd->accepted (est.)", [r / 2 + a for r, a in zip(rtts, accepts)])
+
+
+def bench_http(args):
+    url = f"http://{args.host}:5000/move/forward"
+    body = json.dumps({"speed": 0}).encode()
+    times = []
+    for _ in range(args.count or 200):
+        t0 = time.perf_counter()
+        req = urllib.request.Request(url, body, {"Content-Type": "application/json"})
+        urllib.request.urlopen(req, timeout=2).read()
+        times.append((time.perf_counter() - t0) * 1000)
+    print(f"http: requests={len(times)}")
+    summary("POST /move", times)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=CONTROL_PORT)
+    ap.add_argument("--rate", type=float, default=50.0)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--count", type=int, default=0)
+    ap.add_argument("--amplitude", type=int, default=0, help="throttle/steering máximos enviados")
+    ap.add_argument("--timeout", type=float, default=0.2)
+    ap.add_argument("--seq-start", type=int, default=int(time.time()) & 0xFFFFFF)
+    ap.add_argument("--http", action="store_true", help="medir POST /move del API HTTP")
+    args = ap.parse_args()
+    bench_http(args) if args.http else bench_udp(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# bench_mjpeg.py
+"""
+Micro-benchmark del framing MJPEG: pasa un stream grabado (p. ej.
+`rpicam-vid -t 10000 --codec mjpeg -o clip.mjpeg`) por MJPEGFramer y por el
+loop original de CameraStream._pump, y reporta MB/s y CPU por frame.
+
+    python3 bench_mjpeg.py clip.mjpeg
+    python3 bench_mjpeg.py --synthetic 300 --frame-kb 120
+"""
+import argparse, io, os, time
+from mjpeg_framer import MJPEGFramer
+
+
+def legacy_frames(stream):
+    """Copia del algoritmo anterior (read(4096) + find desde el inicio + del buf[:n])."""
+    buf = bytearray()
+    while True:
+        chunk = stream.read(4096)
+        if not chunk:
+            break
+        buf.extend(chunk)
+        while True:
+            soi = buf.find(b"\xff\xd8")
+            if soi < 0:
+                if len(buf) > 2_000_000:
+                    buf.clear()
+                break
+            eoi = buf.find(b"\xff\xd9", soi + 2)
+            if eoi < 0:
+                if soi > 0:
+                    del buf[:soi]
+                break
+            frame = bytes(buf[soi:eoi+2])
+            del buf[:eoi+2]
+            yield frame
+
+
+def synthetic_stream(count, frame_kb):
+    """Frames con SOI/EOI y payload aleatorio sin bytes 0xFF (sin falsos marcadores)."""
+    parts = []
+    for _ in range(count):
+        payload = os.urandom(frame_kb * 1024).replace(b"\xff", b"\x00")
+        parts.append(b"\xff\xd8" + payload + b"\xff\xd9")
+    return b"".join(parts)
+
+
+def run(name, splitter, data, repeat):
+    frames = 0
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for _ in range(repeat):
+        for _frame in splitter(io.BytesIO(data)):
+            frames += 1
+    cpu = time.process_time() - cpu0
+    wall = time.perf_counter() - wall0
+    mb = len(data) * repeat / 1e6
+    print(f"{name:8s} frames={frames:6d}  {mb / wall:8.1f} MB/s  "
+          f"{cpu / max(frames, 1) * 1e6:8.1f} us CPU/frame")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path", nargs="?", help="stream MJPEG grabado")
+    ap.add_argument("--synthetic", type=int, default=0, help="generar N frames sintéticos")
+    ap.add_argument("--frame-kb", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.path:
+        with open(args.path, "rb") as f:
+            data = f.read()
+    else:
+        data = synthetic_stream(args.synthetic or 300, args.frame_kb)
+
+    print(f"stream: {len(data) / 1e6:.1f} MB")
+    run("legacy", legacy_frames, data, args.repeat)
+    run("framer", lambda s: MJPEGFramer().frames(s), data, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# bench_runtime.py
+"""
+Memoria y tiempo de arranque: los tres APIs sueltos (car_api.py, apiCamera.py,
+apiUltrasonic.py) contra car_runtime.py. Lanza cada layout, espera a que
+todos sus endpoints respondan y suma RSS y PSS (/proc/<pid>/smaps_rollup) de
+sus procesos. Correr en el carro con los servicios de car_init detenidos.
+
+    python3 bench_runtime.py --runs 3
+    python3 bench_runtime.py --layout runtime
+"""
+import argparse, os, statistics, subprocess, sys, time, urllib.request
+from car_config import CAR_PORT, CAMERA_PORT, SENSORS_PORT, RUNTIME_PORT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LAYOUTS = {
+    "split": [("car_api.py", f"http://127.0.0.1:{CAR_PORT}/control"),
+              ("apiCamera.py", f"http://127.0.0.1:{CAMERA_PORT}/healthz"),
+              ("apiUltrasonic.py", f"http://127.0.0.1:{SENSORS_PORT}/status")],
+    "runtime": [("car_runtime.py", f"http://127.0.0.1:{RUNTIME_PORT}/car/control",
+                 f"http://127.0.0.1:{RUNTIME_PORT}/camera/healthz",
+                 f"http://127.0.0.1:{RUNTIME_PORT}/sensors/status")],
+}
+
+
+def memory_kb(pid):
+    """(RSS, PSS) en kB; PSS reparte las páginas compartidas entre procesos."""
+    rss = pss = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1])
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pss = rss
+    return rss, pss
+
+
+def ready(url):
+    try:
+        urllib.request.urlopen(url, timeout=0.5).read()
+        return True
+    except OSError:
+        return False
+
+
+def run_layout(name, timeout, settle):
+    t0 = time.monotonic()
+    procs = []
+    pending = []
+    for script, *urls in LAYOUTS[name]:
+        procs.append(subprocess.Popen([sys.executable, os.path.join(HERE, script)], cwd=HERE,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        pending.extend(urls)
+    try:
+        while pending:
+            if time.monotonic() - t0 > timeout:
+                raise SystemExit(f"{name}: sin respuesta de {pending} en {timeout}s")
+            if any(p.poll() is not None for p in procs):
+                raise SystemExit(f"{name}: un proceso terminó al arrancar")
+            pending = [url for url in pending if not ready(url)]
+            time.sleep(0.05)
+        startup = time.monotonic() - t0
+        time.sleep(settle)   # hilos y timers en régimen antes de medir
+        mem = [memory_kb(p.pid) for p in procs]
+        return startup, sum(r for r, _ in mem), sum(p for _, p in mem)
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        time.sleep(1)   # liberar puertos y GPIO antes de la siguiente corrida
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--layout", choices=["both", *LAYOUTS], default="both")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--settle", type=float, default=2.0)
+    args = ap.parse_args()
+
+    layouts = list(LAYOUTS) if args.layout == "both" else [args.layout]
+    for name in layouts:
+        results = [run_layout(name, args.timeout, args.settle) for _ in range(args.runs)]
+        startup = statistics.median(r[0] for r in results)
+        rss = statistics.median(r[1] for r in results) / 1024
+        pss = statistics.median(r[2] for r in results) / 1024
+        print(f"{name:8s} procesos={len(LAYOUTS[name])}  arranque {startup:6.2f} s  "
+              f"RSS {rss:6.1f} MB  PSS {pss:6.1f} MB  (mediana de {args.runs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# bench_stream.py
+"""
+Prueba de carga de /stream.mjpg: N clientes HTTP simultáneos leen el stream
+multipart y se reporta fps entregado por cliente, percentiles de latencia
+(X-Frame-Time de cada parte contra la hora de llegada) y CPU del servidor.
+
+Sin cámara, levantando el servidor con un origen sintético:
+
+    CAM_SOURCE=synthetic python3 bench_stream.py --spawn "python3 apiCamera.py" -n 8
+    CAM_SOURCE=file CAM_REPLAY_FILE=clip.mjpeg CAM_SERVER=async \\
+        python3 bench_stream.py --spawn "python3 apiCamera.py" -n 16 --query fps=10
+
+Contra un servidor ya corriendo (latencia válida solo con relojes sincronizados):
+
+    python3 bench_stream.py --host car.local -n 4 --server-pid 1234
+"""
+import argparse, asyncio, os, shlex, socket, subprocess, time
+
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+
+class ClientStats:
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.latencies = []
+        self.error = None
+
+
+async def client(host, port, path, duration, stats):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        stats.error = str(e)
+        return
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    deadline = time.monotonic() + duration
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+        if b" 200 " not in head.split(b"\r\n", 1)[0]:
+            stats.error = head.split(b"\r\n", 1)[0].decode()
+            return
+        while time.monotonic() < deadline:
+            part = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), deadline - time.monotonic())
+            headers = {}
+            for line in part.split(b"\r\n"):
+                name, _, value = line.partition(b":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get(b"content-length", 0))
+            await reader.readexactly(length + 2)   # JPEG + CRLF
+            now = time.time()
+            stats.frames += 1
+            stats.bytes += length
+            if b"x-frame-time" in headers:
+                stats.latencies.append(now - float(headers[b"x-frame-time"]))
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+        pass
+    except (OSError, ValueError) as e:
+        stats.error = str(e)
+    finally:
+        writer.close()
+
+
+def cpu_seconds(pid):
+    """utime + stime del proceso (todos sus hilos), en segundos."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK
+
+
+def wait_port(host, port, timeout=15.0):
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < timeout:
+        with socket.socket() as s:
+            if s.connect_ex((host, port)) == 0:
+                return True
+        time.sleep(0.2)
+    return False
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float("nan")
+
+
+async def run(args, pid):
+    path = args.path + (f"?{args.query}" if args.query else "")
+    stats = [ClientStats() for _ in range(args.clients)]
+    # calentamiento: un cliente arranca la cámara (arranque lazy) antes de medir
+    await client(args.host, args.port, path, args.warmup, ClientStats())
+    cpu0, wall0 = (cpu_seconds(pid) if pid else 0.0), time.monotonic()
+    await asyncio.gather(*(client(args.host, args.port, path, args.duration, s) for s in stats))
+    wall = time.monotonic() - wall0
+    cpu = cpu_seconds(pid) - cpu0 if pid else None
+    return stats, wall, cpu
+
+
+def report(stats, wall, cpu):
+    latencies = [x for s in stats for x in s.latencies]
+    for i, s in enumerate(stats):
+        line = f"client {i:3d}  {s.frames / wall:6.1f} fps  {s.bytes * 8 / wall / 1e6:7.2f} Mbit/s"
+        if s.latencies:
+            line += f"  p50 {percentile(s.latencies, 50) * 1000:6.1f} ms"
+        print(line + (f"  ERROR {s.error}" if s.error else ""))
+    fps = [s.frames / wall for s in stats]
+    print(f"\nclients={len(stats)}  fps min/avg/max = {min(fps):.1f}/{sum(fps) / len(fps):.1f}/{max(fps):.1f}")
+    if latencies:
+        print("latency ms  " + "  ".join(f"p{p} {percentile(latencies, p) * 1000:.1f}"
+                                        for p in (50, 90, 95, 99)))
+    if cpu is not None:
+        print(f"server CPU  {cpu / wall * 100:.1f}% of one core")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", "--clients", type=int, default=4)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=5001)
+    ap.add_argument("--path", default="/stream.mjpg")
+    ap.add_argument("--query", default="", help="p. ej. fps=10&scale=0.5")
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--spawn", help="comando del servidor a lanzar (y medir)")
+    ap.add_argument("--server-pid", type=int, help="PID del servidor ya corriendo, para medir CPU")
+    args = ap.parse_args()
+
+    proc = None
+    pid = args.server_pid
+    if args.spawn:
+        proc = subprocess.Popen(shlex.split(args.spawn), stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+        pid = proc.pid
+        if not wait_port(args.host, args.port):
+            proc.kill()
+            raise SystemExit(f"server did not open port {args.port}")
+    try:
+        report(*asyncio.run(run(args, pid)))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# camera_async.py
+import asyncio
+import time
+from async_http import HTTPServer, Response, json_response, websocket_accept, ws_header
+from camera_stream import (CameraStream, index_html, SLOW_FRAMES_TO_DROP, clip_chunks,
+                           frame_headers, mjpeg_part)
+from frame_ring import clip_bounds, find_frame
+from frame_sources import WIDTH, HEIGHT, FPS
+
+# si el socket de un cliente tiene más de esto pendiente, se salta frames hasta que drene
+HIGH_WATER = 256 * 1024
+
+
+class _Client:
+    __slots__ = ("transport", "min_interval", "tier", "last_sent", "congested",
+                 "sent", "dropped")
+
+    def __init__(self, transport, fps=None, tier=0):
+        self.transport = transport
+        self.min_interval = 1.0 / fps if fps else 0.0
+        self.tier = tier
+        self.last_sent = 0.0
+        self.congested = 0
+        self.sent = 0
+        self.dropped = 0
+
+
+class MJPEGFanout:
+    """
+    Una sola tarea reparte cada frame a todos los clientes: el chunk multipart
+    (encabezado + JPEG) se arma una vez por frame y por tier y se escribe tal
+    cual en cada transport. Un cliente con el buffer de envío lleno se salta
+    frames y recibe el más reciente cuando se pone al día (drop-to-latest);
+    si sigue atrasado baja de tier.
+    """
+
+    def __init__(self, cam, high_water=HIGH_WATER):
+        self.cam = cam
+        self.high_water = high_water
+        self.clients = set()
+        self.loop = None
+        self.event = None
+        cam.subscribe(self._on_frame)
+
+    def _on_frame(self, frame, seq, ts):
+        # hilo del origen -> event loop
+        if self.loop is not None and self.clients:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    def _due(self, now):
+        """Clientes que deben recibir este frame, agrupados por tier."""
+        by_tier = {}
+        for client in list(self.clients):
+            transport = client.transport
+            if transport.is_closing():
+                self.clients.discard(client)
+                continue
+            if now - client.last_sent < client.min_interval * 0.9:
+                continue
+            if transport.get_write_buffer_size() > self.high_water:
+                client.dropped += 1
+                client.congested += 1
+                if client.congested >= SLOW_FRAMES_TO_DROP:
+                    client.tier = self.cam.tiers.lower(client.tier)
+                    client.congested = 0
+                continue
+            client.congested = 0
+            by_tier.setdefault(client.tier, []).append(client)
+        return by_tier
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        tiers = self.cam.tiers
+        last = -1
+        while True:
+            await self.event.wait()
+            self.event.clear()
+            with self.cam.cond:
+                frame, seq, ts = self.cam.latest, self.cam.seq, self.cam.latest_ts
+            if frame is None or seq == last:
+                continue
+            last = seq
+            now = time.monotonic()
+            by_tier = self._due(now)
+            if not by_tier:
+                continue
+            if 0 in by_tier:
+                self._write(by_tier.pop(0), mjpeg_part(frame, ts), now)
+            if not by_tier:
+                continue
+            # los tiers reducidos se codifican en paralelo fuera del event loop
+            order = sorted(by_tier)
+            try:
+                images = await asyncio.gather(*(
+                    self.loop.run_in_executor(None, tiers.get, t, seq, frame) for t in order))
+            except Exception as e:
+                print(f"[ERROR] Tier encode failed: {e}")
+                continue
+            for t, image in zip(order, images):
+                self._write(by_tier[t], mjpeg_part(image, ts), now)
+
+    @staticmethod
+    def _write(clients, chunk, now):
+        for client in clients:
+            client.transport.write(chunk)
+            client.last_sent = now
+            client.sent += 1
+
+    async def serve_client(self, request):
+        """Atiende un cliente hasta que se desconecta; con parámetros inválidos devuelve el 400."""
+        args = request.args
+        try:
+            scale = float(args["scale"]) if "scale" in args else None
+            quality = int(args["quality"]) if "quality" in args else None
+            fps = float(args.get("fps") or 0)
+            if fps < 0:
+                raise ValueError("fps negativo")
+        except ValueError:
+            return json_response({"error": "scale/quality/fps inválidos"}, 400)
+        tier = self.cam.tiers.select(scale=scale, quality=quality)
+
+        writer = request.write_head(200, "multipart/x-mixed-replace; boundary=frame",
+                                    {"Cache-Control": "no-cache", "Connection": "close"})
+        client = _Client(writer.transport, fps or None, tier)
+        self.clients.add(client)
+        # acquire puede esperar a que el origen termine de detenerse: fuera del event loop
+        await self.loop.run_in_executor(None, self.cam.acquire, "stream")
+        try:
+            # el cliente no envía nada más: EOF = se desconectó
+            while await request.reader.read(1024):
+                pass
+        finally:
+            self.clients.discard(client)
+            self.cam.release("stream")
+
+
+class _H264Client:
+    __slots__ = ("transport", "websocket", "last", "resync", "sent", "dropped")
+
+    def __init__(self, transport, websocket=False):
+        self.transport = transport
+        self.websocket = websocket
+        self.last = -1           # seq del último access unit enviado
+        self.resync = False      # se atrasó: esperar el próximo keyframe
+        self.sent = 0
+        self.dropped = 0
+
+
+class H264Fanout:
+    """
+    Reparte los access units de H264Stream desde una sola tarea. Un cliente
+    nuevo recibe el GOP en caché y después cada unit tal cual (sin copias por
+    cliente); por WebSocket cada unit va en un mensaje binario. A un cliente
+    con el buffer lleno no se le pueden saltar P-frames sueltos: deja de
+    recibir y retoma en el siguiente keyframe.
+    """
+
+    def __init__(self, stream, cam=None, high_water=HIGH_WATER):
+        self.stream = stream
+        self.cam = cam
+        self.high_water = high_water
+        self.clients = set()
+        self.loop = None
+        self.event = None
+        stream.subscribe(self._on_unit)
+
+    def _on_unit(self, unit):
+        # hilo del pump -> event loop
+        if self.loop is not None and self.clients:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    def _send(self, client):
+        transport = client.transport
+        if transport.is_closing():
+            self.clients.discard(client)
+            return
+        if transport.get_write_buffer_size() > self.high_water:
+            client.resync = True
+            client.dropped += 1
+            return
+        units = self.stream.units_after(client.last)
+        if not units:
+            return
+        if client.resync:
+            if not units[0].keyframe:
+                client.dropped += 1
+                return
+            client.resync = False
+        parts = []
+        for unit in units:
+            if client.websocket:
+                parts.append(ws_header(len(unit.data)))
+            parts.append(unit.data)
+        transport.writelines(parts)
+        client.last = units[-1].seq
+        client.sent += len(units)
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        while True:
+            await self.event.wait()
+            self.event.clear()
+            for client in list(self.clients):
+                self._send(client)
+
+    async def serve_client(self, request):
+        """Atiende un cliente hasta que se desconecta; 503 si la captura MJPEG tiene la cámara."""
+        loop = asyncio.get_running_loop()
+        # cerrar Picamera2 o lanzar rpicam-vid bloquea: fuera del event loop
+        if self.cam is not None and await loop.run_in_executor(None, self.stream.blocked_by, self.cam):
+            return json_response({"error": "cámara en uso por el stream MJPEG"}, 503)
+        await loop.run_in_executor(None, self.stream.acquire)
+        writer = request.writer
+        websocket = websocket_accept(request)
+        if not websocket:
+            request.write_head(200, "video/h264",
+                               {"Cache-Control": "no-cache", "Connection": "close"})
+        client = _H264Client(writer.transport, websocket)
+        self.clients.add(client)
+        self._send(client)   # el GOP en caché sale ya, sin esperar el próximo frame
+        try:
+            while True:
+                data = await request.reader.read(1024)
+                # EOF, o frame de cierre (opcode 0x8) del cliente WebSocket
+                if not data or (websocket and data[0] & 0x0F == 0x8):
+                    break
+        finally:
+            self.clients.discard(client)
+            self.stream.release()
+
+
+def build_app(cam, h264=None, recorder=None, prefix=""):
+    """
+    Rutas de la cámara sobre async_http; también se montan en el runtime
+    unificado, con 'prefix' igual al punto de montaje para los enlaces del índice.
+    """
+    app = HTTPServer()
+    fanout = MJPEGFanout(cam)
+
+    @app.route("/stream.mjpg")
+    async def stream_mjpg(request):
+        return await fanout.serve_client(request)
+
+    @app.route("/snapshot.jpg")
+    async def snapshot(request):
+        loop = asyncio.get_running_loop()
+        img = await loop.run_in_executor(None, cam.get_snapshot)
+        if img is None:
+            return Response("no frame", status=503)
+        return Response(bytes(img), content_type="image/jpeg")
+
+    @app.route("/frame.jpg")
+    async def frame_at(request):
+        try:
+            frame = find_frame(cam.ring, request.args)
+        except ValueError:
+            return Response("bad t/seq", status=400)
+        if frame is None:
+            return Response("frame not in ring", status=404)
+        return Response(bytes(frame.data), content_type="image/jpeg",
+                        headers=frame_headers(frame))
+
+    @app.route("/clip.mjpg")
+    async def clip(request):
+        try:
+            start, end = clip_bounds(request.args)
+        except ValueError:
+            return Response("bad start/end", status=400)
+        frames = cam.ring.clip(start, end)
+        if not frames:
+            return Response("no frames in range", status=404)
+        raw = request.args.get("format") == "raw"
+        writer = request.writer
+        if raw:
+            name = f"clip-{frames[0].seq}-{frames[-1].seq}.mjpeg"
+            request.write_head(200, "video/x-motion-jpeg",
+                               {"Content-Disposition": f'attachment; filename="{name}"',
+                                "Connection": "close"},
+                               length=sum(len(f.data) for f in frames))
+        else:
+            request.write_head(200, "multipart/x-mixed-replace; boundary=frame",
+                               {"Connection": "close"})
+        # un frame a la vez, esperando a que el socket drene
+        for chunk in clip_chunks(frames, raw):
+            writer.write(chunk)
+            await writer.drain()
+
+    @app.route("/")
+    async def index(request):
+        return Response(index_html(prefix), content_type="text/html")
+
+    @app.route("/healthz")
+    async def health(request):
+        return json_response({"ok": True, "width": WIDTH, "height": HEIGHT, "fps": FPS,
+                              "streaming": cam.running, "clients": len(fanout.clients),
+                              "consumers": dict(cam.consumers),
+                              "tiers": [t._asdict() for t in cam.tiers.tiers],
+                              "ring": cam.ring.stats(),
+                              "recorder": recorder.stats() if recorder else None})
+
+    if h264 is not None:
+        h264_fanout = H264Fanout(h264, cam)
+        fanouts = (fanout, h264_fanout)
+
+        @app.route("/stream.h264")
+        async def stream_h264(request):
+            # Annex-B crudo por HTTP, o un access unit por mensaje con Upgrade: websocket
+            return await h264_fanout.serve_client(request)
+
+        @app.route("/h264/stats")
+        async def h264_stats(request):
+            return json_response({**h264.stats(), "clients": len(h264_fanout.clients)})
+    else:
+        fanouts = (fanout,)
+
+    return app, fanouts
+
+
+async def serve(cam, host="0.0.0.0", port=5001, h264=None, recorder=None):
+    app, fanouts = build_app(cam, h264, recorder)
+    tasks = [asyncio.create_task(f.run()) for f in fanouts]
+    try:
+        await app.serve(host, port)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+if __name__ == "__main__":
+    from h264_stream import H264Stream
+    asyncio.run(serve(CameraStream(), h264=H264Stream()))
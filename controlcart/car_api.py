@@ -1,32 +1,31 @@
 from flask import Flask, request, jsonify
+from car_config import (TRACTION_PWM, TRACTION_DIR_PINS, STEERING_PWM, STEERING_DIR_PINS,
+                        LIGHTS_PINS, CAR_PORT)
 from car_controller import CarController
+from control_channel import ControlChannel
+from sensor_feed import SensorFeedReceiver
+from speed_governor import SpeedGovernor
+from state_bus import open_state_bus
 
 app = Flask(__name__)
 
-# Pines tracción
-traction_pwm = 18
-traction_dir_pins = {"in1": 23, "in2": 24}
-
-# Pines steering
-steering_pwm = 12
-steering_dir_pins = {"in3": 20, "in4": 21}
-
-# Pines luces
-lights_pins = {
-    "left_signal": 25,
-    "right_signal": 26,
-    "main_lights": 27
-}
-
 car = CarController(
-    traction_pwm,
-    traction_dir_pins,
-    steering_pwm,
-    steering_dir_pins,
-    lights_pins,
-    frequency=100
+    TRACTION_PWM,
+    TRACTION_DIR_PINS,
+    STEERING_PWM,
+    STEERING_DIR_PINS,
+    LIGHTS_PINS,
+    frequency=100,
+    state_bus=open_state_bus()   # duty/dirección/luces visibles para los otros procesos
 )
 
+# Canal binario UDP para manejo continuo con joystick (CONTROL_UDP_PORT)
+control = ControlChannel(car)
+
+# Governor: cada muestra de ultrasonido (apiUltrasonic.py, por SENSOR_FEED_SOCK) acota la tracción
+governor = SpeedGovernor(car)
+sensor_feed = SensorFeedReceiver(governor.on_sample)
+
 # --- Endpoints ---
 @app.route("/move/<direction>", methods=["POST"])
 def move(direction):
@@ -42,6 +41,20 @@ def steer(direction):
     status = car.steer(direction, pulse_ms=pulse)
     return jsonify({"status": status})
 
+@app.route("/steering", methods=["GET", "POST"])
+def steering():
+    # POST {"position": -100..100} fija la posición absoluta; {"home": true} re-centra sin sensor
+    if request.method == "POST":
+        data = request.get_json(force=True, silent=True) or {}
+        if data.get("home"):
+            car.home_steering()
+        elif "position" in data:
+            try:
+                car.set_steering(float(data["position"]))
+            except (TypeError, ValueError):
+                return jsonify({"error": "position inválida"}), 400
+    return jsonify(car.steering_ctl.status())
+
 @app.route("/light/<name>", methods=["POST"])
 def light(name):
     data = request.get_json(force=True, silent=True) or {}
@@ -54,5 +67,26 @@ def stop():
     car.stop()
     return jsonify({"status": "Carro detenido"})
 
+@app.route("/heartbeat", methods=["POST"])
+def heartbeat():
+    # mantiene el movimiento actual mientras el cliente siga conectado
+    car.heartbeat()
+    return jsonify({"status": "ok", "watchdog": car.watchdog_timeout})
+
+@app.route("/control", methods=["GET"])
+def control_stats():
+    return jsonify({**control.stats(), "watchdog": car.watchdog_status(),
+                    "governor": governor.status(), "motion": car.motion_status()})
+
+@app.route("/state", methods=["GET"])
+def shared_state():
+    # carro, cámara y sensores tal como los publicó cada proceso en el bus
+    if car.state_bus is None:
+        return jsonify({"error": "state bus no disponible"}), 503
+    return jsonify(car.state_bus.snapshot())
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=False)
+    control.start()
+    sensor_feed.start()
+    governor.start()
+    app.run(host="0.0.0.0", port=CAR_PORT, debug=False)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# car_runtime.py
+"""
+Runtime unificado: control, cámara y ultrasonido en un solo proceso asyncio
+y un solo puerto (CAR_RUNTIME_PORT, 8000), con las rutas de cada API bajo
+un prefijo:
+
+    /car/...       las de car_api.py       (move, steer, light, stop, heartbeat, control, state)
+    /camera/...    las de apiCamera.py     (stream.mjpg, snapshot.jpg, stream.h264, ...)
+    /sensors/...   las de apiUltrasonic.py (sensors, sensor/<name>, status, stream)
+
+Un intérprete, un libgpio cargado y sin Flask. El governor recibe las
+muestras del sampler en memoria, sin pasar por el socket de SensorFeed.
+Los tres scripts sueltos siguen funcionando; car_init.sh elige con CAR_RUNTIME=1.
+"""
+import asyncio
+import camera_async
+import car_async
+import sensor_async
+from async_http import HTTPServer, json_response
+from camera_stream import CameraStream
+from car_config import (TRACTION_PWM, TRACTION_DIR_PINS, STEERING_PWM, STEERING_DIR_PINS,
+                        LIGHTS_PINS, ULTRASONIC_PINS, ULTRASONIC_TIMEOUT, SAMPLE_RATE_HZ,
+                        SEPARATION_S, BUFFER_SIZE, MEDIAN_SIZE, STREAM_QUEUE, RUNTIME_PORT)
+from car_controller import CarController
+from control_channel import ControlChannel
+from h264_stream import H264Stream
+from segment_recorder import REC_ENABLED, SegmentRecorder
+from sensor_feed import feed_sample
+from sensor_filters import FilterPipeline
+from sensor_sampler import SensorSampler, SampleBuffer, SampleBroadcaster
+from speed_governor import SpeedGovernor
+from state_bus import open_state_bus
+from ultrasonic_sensor import init_sensor
+
+
+async def main(host="0.0.0.0", port=RUNTIME_PORT):
+    # un solo StateBus para las tres secciones: otros procesos lo siguen leyendo igual
+    state_bus = open_state_bus()
+
+    # --- Control ---
+    car = CarController(TRACTION_PWM, TRACTION_DIR_PINS, STEERING_PWM, STEERING_DIR_PINS,
+                        LIGHTS_PINS, frequency=100, state_bus=state_bus)
+    control = ControlChannel(car)
+
+    # --- Ultrasonido ---
+    sensors = {name: init_sensor(name, trig, echo, ULTRASONIC_TIMEOUT)
+               for name, (trig, echo) in ULTRASONIC_PINS.items()}
+    governor = SpeedGovernor(car, available=[n for n, s in sensors.items()
+                                             if getattr(s, "available", False)])
+    sampler = SensorSampler(sensors, rate_hz=SAMPLE_RATE_HZ, min_separation=SEPARATION_S,
+                            filter_factory=lambda: FilterPipeline(median_size=MEDIAN_SIZE))
+    buffer = SampleBuffer(sensors, size=BUFFER_SIZE)
+    broadcaster = SampleBroadcaster(queue_size=STREAM_QUEUE)
+    sampler.subscribe(buffer.append)
+    sampler.subscribe(broadcaster.publish)
+    # el governor reacciona a cada muestra desde el hilo del sampler, como con el feed
+    sampler.subscribe(lambda sample: governor.on_sample(feed_sample(sample)))
+    if state_bus:
+        sampler.subscribe(state_bus.publish_sensor)
+
+    # --- Cámara (arranque lazy, igual que apiCamera.py) ---
+    cam = CameraStream()
+    h264 = H264Stream()
+    recorder = SegmentRecorder() if REC_ENABLED else None
+    if state_bus:
+        cam.subscribe(state_bus.publish_frame)
+
+    app = HTTPServer()
+    app.mount("/car", car_async.build_app(car, control, governor))
+    camera_app, fanouts = camera_async.build_app(cam, h264, recorder, prefix="/camera")
+    app.mount("/camera", camera_app)
+    app.mount("/sensors", sensor_async.build_app(sensors, sampler, buffer, broadcaster,
+                                                 queue_size=STREAM_QUEUE))
+
+    @app.route("/")
+    async def index(request):
+        return json_response({"status": "ok", "prefixes": ["/car", "/camera", "/sensors"],
+                              "sensors": {n: s is not None for n, s in sensors.items()},
+                              "camera": {"streaming": cam.running, "consumers": dict(cam.consumers)},
+                              "control": control.stats()})
+
+    control.start()
+    governor.start()
+    sampler.start()
+    if recorder:
+        cam.subscribe(recorder.append)
+        recorder.start()
+        cam.acquire("recorder")
+    tasks = [asyncio.create_task(f.run()) for f in fanouts]
+    print(f"[OK] car_runtime en {host}:{port} (/car, /camera, /sensors)")
+    try:
+        await app.serve(host, port)
+    finally:
+        for task in tasks:
+            task.cancel()
+        sampler.stop()
+        control.stop()
+        if recorder:
+            recorder.stop()
+        cam.stop()
+        h264.stop()
+        car.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
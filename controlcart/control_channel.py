@@ -0,0 +1,126 @@
+# control_channel.py
+import os
+import socket
+import struct
+import threading
+import time
+
+CONTROL_PORT = int(os.getenv("CONTROL_UDP_PORT", "5005"))
+
+# Comando (8 bytes, little-endian):
+#   seq u32 | throttle i8 (-100..100) | steering i8 (-100..100) | lights u8 | flags u8
+COMMAND = struct.Struct("<IbbBB")
+# Ack (12 bytes): seq u32 | status u8 | pad | accept_us u32 (recepción -> objetivo aceptado
+# por CarController; el GPIO/PWM lo escribe después la rampa, en el hilo del scheduler)
+ACK = struct.Struct("<IB3xI")
+
+FLAG_ACK = 0x01     # el cliente quiere ack de este comando
+FLAG_STOP = 0x02    # parada de emergencia: CarController.stop()
+
+STATUS_APPLIED = 0  # objetivo aceptado (la rampa lo aplica en los próximos ticks)
+STATUS_STALE = 1    # seq viejo o repetido: descartado
+STATUS_BAD = 2      # datagrama de tamaño incorrecto
+
+# un cliente callado más que esto puede reiniciar su numeración de seq
+SEQ_RESET_AFTER = 1.0
+
+# Linux: timestamp del kernel al recibir el datagrama (SO_TIMESTAMPNS == SCM_TIMESTAMPNS)
+_SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35)
+_TIMESPEC = struct.Struct("@qq")
+
+
+def seq_newer(seq, last):
+    """seq es posterior a last en aritmética de números de serie de 32 bits."""
+    return 0 < ((seq - last) & 0xFFFFFFFF) < 0x80000000
+
+
+class ControlChannel:
+    """
+    Canal de manejo por UDP: cada datagrama es un estado completo (throttle,
+    steering, luces) que va directo a CarController.drive() desde un hilo
+    bloqueado en recvmsg, sin HTTP ni JSON de por medio. Al ser estado y no
+    evento, perder un paquete no importa y uno que llega desordenado se
+    descarta por seq.
+    """
+
+    def __init__(self, car, host="0.0.0.0", port=CONTROL_PORT):
+        self.car = car
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.thread = None
+        self.running = False
+        self.last_seq = {}       # addr -> (seq, hora de llegada)
+        self.received = 0
+        self.applied = 0
+        self.stale = 0
+        self.bad = 0
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, _SO_TIMESTAMPNS, 1)
+        except OSError:
+            pass
+        self.sock.bind((self.host, self.port))
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="control-udp", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            self.sock.close()
+        if self.thread:
+            self.thread.join(timeout=1)
+
+    def _run(self):
+        cmsg_size = socket.CMSG_SPACE(_TIMESPEC.size)
+        while self.running:
+            try:
+                data, ancdata, _, addr = self.sock.recvmsg(64, cmsg_size)
+            except OSError:
+                break   # socket cerrado por stop()
+            arrived = time.time_ns()
+            for level, kind, payload in ancdata:
+                if level == socket.SOL_SOCKET and kind == _SO_TIMESTAMPNS:
+                    sec, nsec = _TIMESPEC.unpack(payload[:_TIMESPEC.size])
+                    arrived = sec * 1_000_000_000 + nsec
+            self.received += 1
+            self._handle(data, addr, arrived)
+
+    def _handle(self, data, addr, arrived):
+        if len(data) != COMMAND.size:
+            self.bad += 1
+            self._ack(addr, 0, STATUS_BAD, arrived)
+            return
+        seq, throttle, steering, lights, flags = COMMAND.unpack(data)
+
+        now = time.monotonic()
+        prev = self.last_seq.get(addr)
+        if prev is not None and now - prev[1] < SEQ_RESET_AFTER and not seq_newer(seq, prev[0]):
+            self.stale += 1
+            if flags & FLAG_ACK:
+                self._ack(addr, seq, STATUS_STALE, arrived)
+            return
+        self.last_seq[addr] = (seq, now)
+
+        if flags & FLAG_STOP:
+            self.car.stop()
+        else:
+            self.car.drive(throttle, steering, lights)
+        self.applied += 1
+        if flags & FLAG_ACK:
+            self._ack(addr, seq, STATUS_APPLIED, arrived)
+
+    def _ack(self, addr, seq, status, arrived):
+        accept_us = max(0, time.time_ns() - arrived) // 1000
+        try:
+            self.sock.sendto(ACK.pack(seq, status, min(accept_us, 0xFFFFFFFF)), addr)
+        except OSError:
+            pass
+
+    def stats(self):
+        return {"port": self.port, "received": self.received, "applied": self.applied,
+                "stale": self.stale, "bad": self.bad}
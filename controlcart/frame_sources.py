@@ -0,0 +1,300 @@
+# frame_sources.py
+import io, os, shlex, subprocess, threading, time
+from contextlib import suppress
+from mjpeg_framer import MJPEGFramer
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:  # sin OpenCV los frames sintéticos no son JPEG decodificables
+    cv2 = np = None
+
+WIDTH  = int(os.getenv("CAM_WIDTH",  "1280"))
+HEIGHT = int(os.getenv("CAM_HEIGHT", "720"))
+FPS    = int(os.getenv("CAM_FPS",    "30"))
+
+# "auto" (picamera2 si está, si no subprocess) | "picamera2" | "subprocess" (rpicam-vid
+# o CAM_SOURCE_CMD) | "file" (CAM_REPLAY_FILE) | "synthetic"
+CAM_SOURCE = os.getenv("CAM_SOURCE", "auto")
+CAM_SOURCE_CMD = os.getenv("CAM_SOURCE_CMD") or (
+    f"rpicam-vid -t 0 --codec mjpeg --width {WIDTH} --height {HEIGHT} "
+    f"--framerate {FPS} --nopreview -o -")
+CAM_REPLAY_FILE = os.getenv("CAM_REPLAY_FILE", "")
+CAM_REPLAY_FPS = float(os.getenv("CAM_REPLAY_FPS", str(FPS)))
+CAM_SYNTH_KB = int(os.getenv("CAM_SYNTH_KB", "60"))
+# disparo único para /snapshot.jpg cuando no hay stream corriendo
+CAM_SNAPSHOT_CMD = os.getenv("CAM_SNAPSHOT_CMD") or (
+    f"rpicam-jpeg -n -t 1 --immediate --width {WIDTH} --height {HEIGHT} -o -")
+# stream YUV420 reducido de picamera2 para visión a bordo
+CAM_LORES = tuple(int(v) for v in os.getenv("CAM_LORES", "320x240").split("x"))
+
+
+class FrameSource:
+    """
+    Origen de frames JPEG para CameraStream. start(publish) arranca la captura
+    en un hilo propio que llama publish(frame, ts) por cada frame ('ts' en
+    time.time() de la captura); stop() la detiene.
+    """
+
+    name = "source"
+
+    def __init__(self):
+        self.publish = None
+        self.thread = None
+        self.running = False
+        self.frames_out = 0
+
+    def start(self, publish):
+        self.publish = publish
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"cam-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+
+    def snapshot(self, timeout):
+        """JPEG sin arrancar la captura continua; None si el origen no tiene ese modo."""
+        return None
+
+    def holds_camera(self):
+        """True si el origen tiene abierto el sensor (otro pipeline no puede usarlo)."""
+        return False
+
+    def close(self):
+        """Detiene la captura y suelta el sensor."""
+        self.stop()
+
+    def _emit(self, frame, ts=None):
+        self.frames_out += 1
+        self.publish(frame, ts or time.time())
+
+    def _run(self):
+        # sin captura propia (p. ej. Picamera2Source, que redefine start()): el hilo termina
+        self.running = False
+
+
+class SubprocessSource(FrameSource):
+    """Comando que escribe MJPEG en stdout (rpicam-vid por defecto); frames vía MJPEGFramer."""
+
+    name = "subprocess"
+
+    def __init__(self, cmd=CAM_SOURCE_CMD, snapshot_cmd=CAM_SNAPSHOT_CMD):
+        super().__init__()
+        self.cmd = cmd
+        self.snapshot_cmd = snapshot_cmd
+        self.proc = None
+
+    def _run(self):
+        self.proc = subprocess.Popen(
+            shlex.split(self.cmd), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0
+        )
+        framer = MJPEGFramer()
+        try:
+            # cada frame es un memoryview sobre la arena del framer (sin copias)
+            for frame in framer.frames(self.proc.stdout):
+                if not self.running:
+                    break
+                self._emit(frame)
+        finally:
+            self.running = False
+            with suppress(Exception):
+                self.proc.terminate()
+            with suppress(Exception):
+                self.proc.wait(timeout=2)
+
+    def stop(self):
+        self.running = False
+        with suppress(Exception):
+            self.proc.terminate()   # desbloquea la lectura de stdout
+        super().stop()
+
+    def snapshot(self, timeout):
+        if not self.snapshot_cmd:
+            return None
+        try:
+            out = subprocess.run(shlex.split(self.snapshot_cmd), stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL, timeout=timeout).stdout
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"[WARN] Snapshot command failed: {e}")
+            return None
+        return out if out.startswith(b"\xff\xd8") else None
+
+    def holds_camera(self):
+        return self.running
+
+
+class Picamera2Source(FrameSource):
+    """
+    Captura en el mismo proceso con picamera2: el encoder MJPEG entrega cada
+    JPEG completo por callback, sin pipe ni búsqueda de SOI/EOI. Configura
+    además el stream 'lores' YUV420 para visión a bordo (ver lores()).
+    """
+
+    name = "picamera2"
+
+    def __init__(self, width=WIDTH, height=HEIGHT, fps=FPS, lores_size=CAM_LORES):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.lores_size = lores_size
+        self.picam2 = None
+
+    @staticmethod
+    def available():
+        """picamera2 instalado y al menos una cámara detectada (sin abrirla)."""
+        try:
+            from picamera2 import Picamera2
+            return bool(Picamera2.global_camera_info())
+        except Exception:
+            return False
+
+    def start(self, publish):
+        from picamera2 import Picamera2
+        from picamera2.encoders import MJPEGEncoder
+        from picamera2.outputs import Output
+
+        source = self
+
+        class _Output(Output):
+            # la firma cambió entre versiones de picamera2 (packet, audio, ...)
+            def outputframe(self, frame, keyframe=True, timestamp=None, *args, **kwargs):
+                if source.running:
+                    source._emit(frame)
+
+        self.publish = publish
+        picam2 = self.picam2
+        try:
+            if picam2 is None:
+                picam2 = self.picam2 = Picamera2()
+                picam2.configure(picam2.create_video_configuration(
+                    main={"size": (self.width, self.height)},
+                    lores={"size": self.lores_size, "format": "YUV420"},
+                    controls={"FrameRate": self.fps}))
+            self.running = True
+            picam2.start_recording(MJPEGEncoder(), _Output())
+        except Exception as e:
+            print(f"[ERROR] picamera2 start failed: {e}")
+            self.close()
+
+    def stop(self):
+        """Detiene la captura pero deja la cámara abierta y configurada (rearranque rápido)."""
+        self.running = False
+        if self.picam2 is not None:
+            with suppress(Exception):
+                self.picam2.stop_recording()
+
+    def holds_camera(self):
+        # detenida sigue abierta (stop() la deja configurada): solo close() la suelta
+        return self.picam2 is not None
+
+    def close(self):
+        self.stop()
+        picam2, self.picam2 = self.picam2, None
+        if picam2 is not None:
+            with suppress(Exception):
+                picam2.close()
+
+    def lores(self):
+        """Siguiente frame lores como array YUV420 (alto * 3/2, ancho); None si no captura."""
+        picam2 = self.picam2
+        return picam2.capture_array("lores") if picam2 is not None and self.running else None
+
+
+class _PacedSource(FrameSource):
+    """Publica una lista de frames en bucle a 'fps', con deadlines absolutos."""
+
+    def __init__(self, fps):
+        super().__init__()
+        self.fps = fps
+        self.frames = []
+
+    def _load(self):
+        """Frames JPEG a publicar en bucle; vacío = nada que reproducir."""
+        return []
+
+    def _run(self):
+        if not self.frames:
+            self.frames = self._load()
+        if not self.frames:
+            print(f"[ERROR] {self.name}: no frames to replay")
+            self.running = False
+            return
+        interval = 1.0 / self.fps
+        deadline = time.monotonic()
+        while self.running:
+            for frame in self.frames:
+                if not self.running:
+                    break
+                self._emit(frame)
+                deadline += interval
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -interval:
+                    deadline = time.monotonic()  # atrasados: no recuperar en ráfaga
+
+
+class FileReplaySource(_PacedSource):
+    """Reproduce un MJPEG grabado (p. ej. `rpicam-vid --codec mjpeg -o clip.mjpeg`) en bucle."""
+
+    name = "file"
+
+    def __init__(self, path=CAM_REPLAY_FILE, fps=CAM_REPLAY_FPS):
+        super().__init__(fps)
+        self.path = path
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            return list(MJPEGFramer().frames(io.BytesIO(f.read())))
+
+
+class SyntheticSource(_PacedSource):
+    """
+    Frames generados al arrancar y repetidos en bucle: JPEG reales con el
+    número de frame si hay OpenCV, si no bloques SOI/EOI del tamaño pedido.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, fps=FPS, width=WIDTH, height=HEIGHT, frame_kb=CAM_SYNTH_KB, count=30):
+        super().__init__(fps)
+        self.width = width
+        self.height = height
+        self.frame_kb = frame_kb
+        self.count = count
+
+    def _load(self):
+        frames = []
+        for i in range(self.count):
+            if cv2 is None:
+                payload = os.urandom(self.frame_kb * 1024).replace(b"\xff", b"\x00")
+                frames.append(b"\xff\xd8" + payload + b"\xff\xd9")
+                continue
+            img = np.zeros((self.height, self.width, 3), np.uint8)
+            img[:, :, 1] = (np.arange(self.width) + i * 8) % 256
+            cv2.putText(img, f"{i:03d}", (40, self.height // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                        4, (255, 255, 255), 8)
+            frames.append(cv2.imencode(".jpg", img)[1].tobytes())
+        return frames
+
+
+def create_source(kind=None):
+    """Origen de frames según CAM_SOURCE."""
+    kind = (kind or CAM_SOURCE).lower()
+    if kind in ("auto", "picamera2"):
+        if Picamera2Source.available():
+            return Picamera2Source()
+        if kind == "picamera2":
+            print("[WARN] picamera2 not available, using subprocess")
+        kind = "subprocess"
+    if kind == "file":
+        return FileReplaySource()
+    if kind == "synthetic":
+        return SyntheticSource()
+    if kind != "subprocess":
+        print(f"[WARN] Unknown CAM_SOURCE '{kind}', using subprocess")
+    return SubprocessSource()
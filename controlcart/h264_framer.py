@@ -0,0 +1,110 @@
+# h264_framer.py
+from collections import namedtuple
+
+START_CODE = b"\x00\x00\x01"
+START_CODE4 = b"\x00\x00\x00\x01"
+
+# tipos de NAL (H.264 tabla 7-1) que usa el framer
+NAL_SLICE = 1
+NAL_IDR = 5
+NAL_SEI = 6
+NAL_SPS = 7
+NAL_PPS = 8
+NAL_AUD = 9
+
+# NALs no-VCL que, después de un slice, abren el siguiente access unit (7.4.1.2.3)
+_AU_PREFIX = (NAL_SEI, NAL_SPS, NAL_PPS, NAL_AUD)
+
+AccessUnit = namedtuple("AccessUnit", "seq data keyframe")
+
+
+class AnnexBFramer:
+    """
+    Separa un stream H.264 Annex-B en NAL units y las agrupa en access units
+    (un frame cada uno, ya con start codes de 4 bytes, listo para enviar).
+
+    Un access unit nuevo empieza con un AUD/SEI/SPS/PPS o con un slice cuyo
+    first_mb_in_slice es 0. Guarda el último SPS/PPS y los antepone a los IDR
+    que no los traen (fuentes sin --inline), así cada keyframe es un punto de
+    entrada completo para un cliente nuevo.
+    """
+
+    def __init__(self, read_size=64 * 1024, max_nal=4 * 1024 * 1024):
+        self.read_size = read_size
+        self.max_nal = max_nal
+        self.sps = None
+        self.pps = None
+        self.nals_in = 0
+        self.bytes_in = 0
+        self.units_out = 0
+        self.keyframes = 0
+
+    def nal_units(self, stream):
+        """Generador de NALs (bytes, sin start code) leídos de 'stream' hasta EOF."""
+        buf = bytearray()
+        start = -1   # inicio del NAL en curso (-1 = buscando el primer start code)
+        scan = 0     # desde dónde seguir buscando el start code
+        while True:
+            chunk = stream.read(self.read_size)
+            if not chunk:
+                break
+            self.bytes_in += len(chunk)
+            buf += chunk
+            while True:
+                i = buf.find(START_CODE, scan)
+                if i < 0:
+                    # conservar dos bytes por si el start code quedó partido
+                    scan = max(len(buf) - 2, start, 0)
+                    break
+                if start >= 0:
+                    # el cero extra de un start code de 4 bytes no es parte del NAL
+                    end = i - 1 if i > start and buf[i - 1] == 0 else i
+                    if end > start:
+                        self.nals_in += 1
+                        yield bytes(buf[start:end])
+                start = scan = i + 3
+            if start > 0:
+                del buf[:start]
+                scan -= start
+                start = 0
+            elif start < 0:
+                del buf[:scan]
+                scan = 0
+            if len(buf) > self.max_nal:
+                # NAL corrupto o sin fin: descartar y resincronizar
+                buf.clear()
+                start, scan = -1, 0
+        if start >= 0 and len(buf) > start:
+            self.nals_in += 1
+            yield bytes(buf[start:])
+
+    def access_units(self, stream, seq=0):
+        """Generador de AccessUnit numerados desde seq + 1."""
+        nals, has_vcl, key = [], False, False
+        for nal in self.nal_units(stream):
+            kind = nal[0] & 0x1F
+            vcl = kind in (NAL_SLICE, NAL_IDR)
+            if has_vcl and (kind in _AU_PREFIX or (vcl and len(nal) > 1 and nal[1] & 0x80)):
+                seq += 1
+                yield self._unit(seq, nals, key)
+                nals, has_vcl, key = [], False, False
+            if kind == NAL_SPS:
+                self.sps = nal
+            elif kind == NAL_PPS:
+                self.pps = nal
+            nals.append(nal)
+            has_vcl = has_vcl or vcl
+            key = key or kind == NAL_IDR
+        if has_vcl:
+            yield self._unit(seq + 1, nals, key)
+
+    def _unit(self, seq, nals, key):
+        if key:
+            self.keyframes += 1
+            if self.sps and self.pps and not any(n[0] & 0x1F == NAL_SPS for n in nals):
+                nals = [self.sps, self.pps] + nals
+        parts = []
+        for nal in nals:
+            parts += (START_CODE4, nal)
+        self.units_out += 1
+        return AccessUnit(seq, b"".join(parts), key)
@@ -0,0 +1,74 @@
+# mjpeg_framer.py
+
+SOI = b"\xff\xd8"  # start of image
+EOI = b"\xff\xd9"  # end of image
+
+
+class MJPEGFramer:
+    """
+    Separa un stream de JPEGs concatenados sin copiar los frames.
+
+    Lee con readinto() dentro de una arena preasignada y publica cada frame
+    completo como un memoryview sobre la arena. La búsqueda de EOI continúa
+    donde quedó en la lectura anterior. Cuando la arena se llena se crea una
+    nueva y solo se copia el frame incompleto del final; la arena vieja vive
+    mientras algún consumidor tenga un frame suyo.
+    """
+
+    def __init__(self, arena_size=4 * 1024 * 1024, read_size=64 * 1024, max_frame=2_000_000):
+        self.arena_size = arena_size
+        self.read_size = read_size
+        self.max_frame = max_frame
+        self.frames_out = 0
+        self.bytes_in = 0
+        self.arenas = 0
+
+    def _new_arena(self, size):
+        self.arenas += 1
+        arena = bytearray(size)
+        return arena, memoryview(arena)
+
+    def frames(self, stream):
+        """Generador de frames (memoryview) leídos de 'stream' hasta EOF."""
+        arena, view = self._new_arena(self.arena_size)
+        start = end = 0   # datos aún no consumidos: arena[start:end]
+        soi = -1          # inicio del frame en curso (-1 = buscando SOI)
+        scan = 0          # desde dónde seguir buscando el marcador
+
+        while True:
+            if len(arena) - end < self.read_size:
+                tail = end - start
+                if tail > self.max_frame:
+                    # frame corrupto o sin EOI: descartar y resincronizar
+                    start, tail, soi = end, 0, -1
+                new, new_view = self._new_arena(max(self.arena_size, tail + 2 * self.read_size))
+                new_view[:tail] = view[start:end]
+                if soi >= 0:
+                    soi -= start
+                scan = max(0, scan - start)
+                arena, view = new, new_view
+                start, end = 0, tail
+
+            n = stream.readinto(view[end:end + self.read_size])
+            if not n:
+                break
+            end += n
+            self.bytes_in += n
+
+            while True:
+                if soi < 0:
+                    i = arena.find(SOI, scan, end)
+                    if i < 0:
+                        # conservar el último byte por si el marcador quedó partido
+                        start = scan = max(start, end - 1)
+                        break
+                    soi = start = i
+                    scan = i + 2
+                j = arena.find(EOI, scan, end)
+                if j < 0:
+                    scan = max(soi + 2, end - 1)
+                    break
+                self.frames_out += 1
+                yield view[soi:j + 2]
+                start = scan = j + 2
+                soi = -1
@@ -0,0 +1,130 @@
+# motion_profile.py
+import os
+import time
+
+# Rampa de tracción en % de duty por segundo: subiendo y bajando (0 = salto inmediato)
+TRACTION_ACCEL = float(os.getenv("CAR_ACCEL_PCT_S", "400"))
+TRACTION_DECEL = float(os.getenv("CAR_DECEL_PCT_S", "0"))
+# Steering: el motor es chico, la rampa solo evita el pico al arrancar
+STEERING_ACCEL = float(os.getenv("CAR_STEER_ACCEL_PCT_S", "1000"))
+STEERING_DECEL = float(os.getenv("CAR_STEER_DECEL_PCT_S", "0"))
+# Puente suelto entre soltar un sentido y tomar el contrario
+COAST_S = float(os.getenv("CAR_COAST_MS", "60")) / 1000.0
+# Periodo del timer de rampa en el scheduler PWM
+RAMP_TICK = float(os.getenv("CAR_RAMP_TICK_MS", "20")) / 1000.0
+
+
+class MotionProfile:
+    """
+    Un eje con puente H (tracción o steering) manejado por objetivo: duty con
+    signo en -100..100. set_target() solo guarda el objetivo; un timer del
+    scheduler PWM, armado mientras el duty aplicado no llegó, lo acerca cada
+    'tick' a 'accel' %/s subiendo y a 'decel' %/s bajando (0 = de una vez).
+
+    Para invertir el sentido baja a 0, suelta los dos pines del puente,
+    espera 'coast' s con el motor en rueda libre y recién ahí toma el sentido
+    contrario: sin picos de corriente que tiren la alimentación de la Pi.
+
+    Comparte el lock del CarController: set_target()/halt() se llaman con él
+    tomado y el timer lo toma para cada paso.
+    """
+
+    def __init__(self, pwm, outputs, pins, scheduler, lock, accel=TRACTION_ACCEL,
+                 decel=TRACTION_DECEL, coast=COAST_S, tick=RAMP_TICK, on_change=None):
+        self.pwm = pwm
+        self.outputs = outputs
+        # pins = (pin en 1 para sentido positivo, pin en 1 para sentido negativo)
+        pos, neg = pins
+        self.pin_levels = {1: {pos: 1, neg: 0}, -1: {pos: 0, neg: 1}, 0: {pos: 0, neg: 0}}
+        self.scheduler = scheduler
+        self.lock = lock
+        self.accel = accel
+        self.decel = decel
+        self.coast = coast
+        self.tick = tick
+        self.on_change = on_change
+        self.target = 0
+        self.duty = 0.0
+        self.direction = 0          # sentido tomado en el puente: 1, -1 o 0 (suelto)
+        self.coast_until = 0.0
+        self.timer = None
+        self.last_step = 0.0
+        self.reversals = 0
+
+    def set_target(self, target):
+        # llamado con self.lock tomado; barato: el trabajo lo hace el timer
+        self.target = max(-100, min(100, target))
+        if self.timer is None and not self.settled():
+            now = time.monotonic()
+            self.last_step = now - self.tick   # el primer paso sale completo y ya
+            self.timer = self.scheduler.call_at(now, self._tick, on_error=self._timer_failed)
+
+    def settled(self):
+        want = (self.target > 0) - (self.target < 0)
+        return self.duty == abs(self.target) and self.direction == want
+
+    def halt(self):
+        # llamado con self.lock tomado: duty a 0 ya, sin rampa (stop y watchdog).
+        # Los pines los suelta el que llama, junto con los demás.
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.target = 0
+        if self.duty or self.direction:
+            self.coast_until = time.monotonic() + self.coast
+        self.duty = 0.0
+        self.direction = 0
+        self.pwm.set_duty_cycle(0)
+
+    def _timer_failed(self, timer):
+        # el scheduler descartó el timer: el próximo set_target() lo vuelve a armar
+        with self.lock:
+            if self.timer is timer:
+                self.timer = None
+
+    def _tick(self, deadline):
+        with self.lock:
+            if self.timer is None:
+                return None
+            now = time.monotonic()
+            self._step(now, min(now - self.last_step, self.tick))
+            self.last_step = now
+            if self.on_change is not None:
+                self.on_change()
+            if self.settled():
+                self.timer = None
+                return None
+            return max(deadline + self.tick, now)
+
+    def _step(self, now, dt):
+        want_dir = (self.target > 0) - (self.target < 0)
+        if self.direction and self.direction != want_dir:
+            # sentido equivocado (o hay que parar): bajar; en 0 soltar el puente
+            self._approach(0.0, dt)
+            if self.duty == 0:
+                self.outputs.write_many(self.pin_levels[0])
+                self.direction = 0
+                self.coast_until = now + self.coast
+                if want_dir:
+                    self.reversals += 1
+            return
+        if self.direction == 0 and want_dir:
+            if now < self.coast_until:
+                return   # rueda libre antes de tomar el sentido
+            self.outputs.write_many(self.pin_levels[want_dir])
+            self.direction = want_dir
+        self._approach(float(abs(self.target)), dt)
+
+    def _approach(self, goal, dt):
+        if goal > self.duty:
+            duty = goal if self.accel <= 0 else min(goal, self.duty + self.accel * dt)
+        else:
+            duty = goal if self.decel <= 0 else max(goal, self.duty - self.decel * dt)
+        if round(duty) != round(self.duty):
+            # al PWM solo van pasos enteros: menos escrituras por tick
+            self.pwm.set_duty_cycle(round(duty))
+        self.duty = duty
+
+    def status(self):
+        return {"target": self.target, "duty": round(self.duty, 1), "direction": self.direction,
+                "ramping": self.timer is not None, "reversals": self.reversals}
@@ -1,40 +1,342 @@
-import time, threading
+import heapq, itertools, os, time, threading
 from gpio_adapter import GPIOAdapter
 
+# "auto": PWM por hardware si el pin lo soporta, si no "software"
+PWM_ENGINE = os.getenv("PWM_ENGINE", "auto")
+PWM_SYSFS_ROOT = os.getenv("PWM_SYSFS_ROOT", "/sys/class/pwm")
+
+
+def _parse_hw_pins(spec):
+    """'18:0:0,19:0:1' -> {18: (0, 0), 19: (0, 1)} (pin BCM: pwmchip, canal)."""
+    pins = {}
+    for item in filter(None, spec.split(",")):
+        pin, chip, channel = (int(x) for x in item.split(":"))
+        pins[pin] = (chip, channel)
+    return pins
+
+
+# Pines ruteados al PWM del SoC; por defecto el overlay pwm-2chan (GPIO18 y GPIO19)
+PWM_HW_PINS = _parse_hw_pins(os.getenv("PWM_HW_PINS", "18:0:0,19:0:1"))
+
+
+class PWMStats:
+    """Error medido de periodo y duty cycle de un canal PWM por software."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.periods = 0
+        self.missed = 0
+        self._period_err_sum = 0.0
+        self._period_err_max = 0.0
+        self._duty_err_sum = 0.0
+        self._duty_err_max = 0.0
+        self._late_sum = 0.0
+        self._late_max = 0.0
+        self._edges = 0
+
+    def record_edge(self, lateness):
+        self._edges += 1
+        self._late_sum += lateness
+        self._late_max = max(self._late_max, lateness)
+
+    def record_period(self, period_err, duty_err):
+        self.periods += 1
+        self._period_err_sum += abs(period_err)
+        self._period_err_max = max(self._period_err_max, abs(period_err))
+        self._duty_err_sum += abs(duty_err)
+        self._duty_err_max = max(self._duty_err_max, abs(duty_err))
+
+    def as_dict(self):
+        n = self.periods or 1
+        e = self._edges or 1
+        return {
+            "periods": self.periods,
+            "missed_periods": self.missed,
+            "period_err_mean_us": self._period_err_sum / n * 1e6,
+            "period_err_max_us": self._period_err_max * 1e6,
+            "duty_err_mean_pct": self._duty_err_sum / n,
+            "duty_err_max_pct": self._duty_err_max,
+            "edge_late_mean_us": self._late_sum / e * 1e6,
+            "edge_late_max_us": self._late_max * 1e6,
+        }
+
+
+class PWMScheduler:
+    """
+    Un solo hilo para todos los canales PWM, blinkers y pulsos temporizados:
+    un heap de deadlines absolutos (time.monotonic()).
+
+    Cada callback recibe su deadline como primer argumento y devuelve el
+    próximo deadline para volver a ejecutarse, o None para terminar. Si
+    lanza una excepción el timer se descarta y se llama a su 'on_error'
+    (si tiene) para que el dueño suelte el handle y pueda volver a armarlo.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.heap = []
+        self.counter = itertools.count()
+        self.thread = None
+
+    def call_at(self, deadline, callback, *args, on_error=None):
+        timer = Timer(deadline, callback, args, on_error)
+        with self.cond:
+            heapq.heappush(self.heap, (deadline, next(self.counter), timer))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="pwm-scheduler",
+                                               daemon=True)
+                self.thread.start()
+            elif self.heap[0][2] is timer:
+                # nuevo primer deadline: despertar al hilo para recalcular la espera
+                self.cond.notify()
+        return timer
+
+    def call_later(self, delay, callback, *args, on_error=None):
+        return self.call_at(time.monotonic() + delay, callback, *args, on_error=on_error)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    deadline, _, timer = self.heap[0]
+                    if timer.cancelled:
+                        heapq.heappop(self.heap)
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        self.cond.wait(remaining)
+                        continue
+                    heapq.heappop(self.heap)
+                    break
+
+            # fuera del lock: los callbacks pueden tomar sus propios locks y re-planificar
+            try:
+                nxt = timer.callback(deadline, *timer.args)
+            except Exception as e:
+                print(f"[ERROR] PWMScheduler callback {timer.callback!r} failed: {e}")
+                timer.cancelled = True
+                if timer.on_error is not None:
+                    try:
+                        timer.on_error(timer)
+                    except Exception as e:
+                        print(f"[ERROR] PWMScheduler on_error {timer.on_error!r} failed: {e}")
+                continue
+            if nxt is not None and not timer.cancelled:
+                timer.deadline = nxt
+                with self.cond:
+                    heapq.heappush(self.heap, (nxt, next(self.counter), timer))
+
+
+class Timer:
+    """Entrada del PWMScheduler; cancel() la descarta sin tocar el heap."""
+
+    __slots__ = ("deadline", "callback", "args", "on_error", "cancelled")
+
+    def __init__(self, deadline, callback, args, on_error=None):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.on_error = on_error   # on_error(timer) si el callback lanzó excepción
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Scheduler compartido por todo el proceso."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PWMScheduler()
+        return _scheduler
+
+
 class SoftwarePWM:
-    def __init__(self, bcm_pin, frequency=100):
+    """Canal PWM por software: sus flancos los genera el PWMScheduler compartido."""
+
+    def __init__(self, bcm_pin, frequency=100, scheduler=None):
         self.gpio = GPIOAdapter(bcm_pin)
         self.gpio.set_direction("out")
+        self.scheduler = scheduler or get_scheduler()
         self.frequency = frequency
         self.period = 1.0 / frequency
         self.duty_cycle = 0
         self.running = False
-        self.thread = None
+        self.lock = threading.Lock()
+        self.timer = None           # None = en reposo (0%/100%), sin despertar al scheduler
+        self.error_stats = PWMStats()
+        self.level = 0
+        self._rise = None           # instante real del último flanco de subida
+        self._prev_rise = None
+        self._rise_deadline = None  # instante planificado de ese flanco
+        self._rise_duty = 0
+
+    def _set_level(self, level):
+        self.gpio.write(level)
+        self.level = level
+
+    def _edge(self, deadline):
+        """Aplica el flanco planificado en 'deadline' y devuelve el siguiente (None = en reposo)."""
+        with self.lock:
+            if not self.running:
+                self.timer = None
+                return None
+            duty = self.duty_cycle
+            if duty <= 0 or duty >= 100:
+                self._set_level(1 if duty >= 100 else 0)
+                self._rise = self._prev_rise = self._rise_deadline = None
+                self.timer = None
+                return None
+
+            now = time.monotonic()
+            if self.level == 0:
+                if now - deadline > self.period:
+                    # más de un periodo de atraso: resincronizar en vez de acumular flancos
+                    self.error_stats.missed += 1
+                    deadline = now
+                    self._prev_rise = None
+                self._set_level(1)
+                t = time.monotonic()
+                self.error_stats.record_edge(t - deadline)
+                self._rise = t
+                self._rise_deadline = deadline
+                self._rise_duty = duty
+                return deadline + self.period * duty / 100.0
+
+            self._set_level(0)
+            t = time.monotonic()
+            self.error_stats.record_edge(t - deadline)
+            if self._rise is not None:
+                duty_err = (t - self._rise) / self.period * 100.0 - self._rise_duty
+                period_err = 0.0
+                if self._prev_rise is not None:
+                    period_err = (self._rise - self._prev_rise) - self.period
+                self.error_stats.record_period(period_err, duty_err)
+            self._prev_rise = self._rise
+            # sin subida registrada (arrancó en alto): el periodo cuenta desde esta bajada
+            base = self._rise_deadline if self._rise_deadline is not None else deadline
+            return base + self.period
+
+    def _arm(self):
+        # llamado con self.lock tomado
+        if self.running and self.timer is None:
+            self.timer = self.scheduler.call_later(0, self._edge, on_error=self._timer_failed)
+
+    def _timer_failed(self, timer):
+        # el scheduler descartó el timer: soltar el handle para que set_duty_cycle re-arme
+        with self.lock:
+            if self.timer is timer:
+                self.timer = None
+
+    def start(self, duty_cycle=0):
+        with self.lock:
+            self.running = True
+        self.set_duty_cycle(duty_cycle)
+
+    def set_duty_cycle(self, duty_cycle):
+        with self.lock:
+            self.duty_cycle = max(0, min(100, duty_cycle))
+            self._arm()
+
+    def stats(self):
+        return dict(self.error_stats.as_dict(), engine="software",
+                    frequency=self.frequency, duty_cycle=self.duty_cycle)
 
-    def _loop(self):
-        while self.running:
-            on_time = self.period * (self.duty_cycle / 100.0)
-            off_time = self.period - on_time
-            if on_time > 0:
-                self.gpio.write(1)
-                time.sleep(on_time)
-            if off_time > 0:
-                self.gpio.write(0)
-                time.sleep(off_time)
+    def reset_stats(self):
+        self.error_stats.reset()
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.gpio.write(0)
+            self.gpio.cleanup()
+
+
+class HardwarePWM:
+    """PWM del SoC vía /sys/class/pwm; mismo interfaz que SoftwarePWM, sin hilos."""
+
+    def __init__(self, bcm_pin, frequency=100, root=None):
+        chip, channel = PWM_HW_PINS[bcm_pin]
+        self.root = root or PWM_SYSFS_ROOT
+        self.chip_dir = os.path.join(self.root, f"pwmchip{chip}")
+        self.channel = channel
+        self.pwm_dir = os.path.join(self.chip_dir, f"pwm{channel}")
+        self.frequency = frequency
+        self.period_ns = int(1e9 / frequency)
+        self.duty_cycle = 0
+        self.running = False
+        self.duty_fd = None
+
+        if not os.path.isdir(self.pwm_dir):
+            self._write_attr("export", channel, base=self.chip_dir)
+            deadline = time.monotonic() + 1.0
+            while not os.path.isdir(self.pwm_dir):
+                if time.monotonic() > deadline:
+                    raise OSError(f"Canal PWM {channel} no apareció en {self.chip_dir}")
+                time.sleep(0.01)
+        # duty a 0 antes de cambiar el periodo (el kernel exige duty <= periodo)
+        self._write_attr("duty_cycle", 0)
+        self._write_attr("period", self.period_ns)
+
+    @staticmethod
+    def available(bcm_pin, root=None):
+        if bcm_pin not in PWM_HW_PINS:
+            return False
+        chip, _ = PWM_HW_PINS[bcm_pin]
+        return os.path.isdir(os.path.join(root or PWM_SYSFS_ROOT, f"pwmchip{chip}"))
+
+    def _write_attr(self, name, value, base=None):
+        fd = os.open(os.path.join(base or self.pwm_dir, name), os.O_WRONLY)
+        try:
+            os.write(fd, str(value).encode())
+        finally:
+            os.close(fd)
 
     def start(self, duty_cycle=0):
         self.set_duty_cycle(duty_cycle)
         if not self.running:
+            self._write_attr("enable", 1)
             self.running = True
-            self.thread = threading.Thread(target=self._loop, daemon=True)
-            self.thread.start()
 
     def set_duty_cycle(self, duty_cycle):
         self.duty_cycle = max(0, min(100, duty_cycle))
+        if self.duty_fd is None:
+            self.duty_fd = os.open(os.path.join(self.pwm_dir, "duty_cycle"), os.O_WRONLY)
+        os.pwrite(self.duty_fd, str(int(self.period_ns * self.duty_cycle / 100)).encode(), 0)
+
+    def stats(self):
+        # el periodo lo genera el hardware: no hay error de planificación que medir
+        return {"engine": "hardware", "frequency": self.frequency,
+                "duty_cycle": self.duty_cycle}
+
+    def reset_stats(self):
+        pass
 
     def stop(self):
+        self.set_duty_cycle(0)
+        self._write_attr("enable", 0)
         self.running = False
-        if self.thread:
-            self.thread.join()
-        self.gpio.write(0)
-        self.gpio.cleanup()
+        os.close(self.duty_fd)
+        self.duty_fd = None
+        self._write_attr("unexport", self.channel, base=self.chip_dir)
+
+
+def create_pwm(bcm_pin, frequency=100, engine=None):
+    """Crea el canal PWM según el motor pedido (PWM_ENGINE por defecto)."""
+    engine = engine or PWM_ENGINE
+    if engine == "hardware" or (engine == "auto" and HardwarePWM.available(bcm_pin)):
+        return HardwarePWM(bcm_pin, frequency)
+    return SoftwarePWM(bcm_pin, frequency)
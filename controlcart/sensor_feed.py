@@ -0,0 +1,113 @@
+# sensor_feed.py
+import math
+import os
+import socket
+import struct
+import threading
+from collections import namedtuple
+
+# Unix datagram socket owned by the receiving process (car_api.py)
+FEED_PATH = os.getenv("SENSOR_FEED_SOCK", "/tmp/car-sensors.sock")
+
+# name 8s | ok u8 | pad | seq u32 | distance f32 | filtered f32 | velocity f32 | ttc f32 | monotonic f64
+# Missing values travel as NaN; monotonic is CLOCK_MONOTONIC, shared by every process on the car
+FEED_RECORD = struct.Struct("<8sB3xIffffd")
+
+FeedSample = namedtuple("FeedSample", "name ok seq distance_cm filtered_cm velocity_cms ttc_s monotonic")
+
+_NAN = float("nan")
+
+
+def _f(value):
+    return _NAN if value is None else value
+
+
+def _opt(value):
+    return None if math.isnan(value) else value
+
+
+def feed_sample(sample, seq=0):
+    """FeedSample from a sampler Sample, for consumers running in the sampler's own process."""
+    return FeedSample(sample.name, sample.status == "ok", seq, sample.distance_cm,
+                      sample.filtered_cm, sample.velocity_cms, sample.ttc_s, sample.monotonic)
+
+
+class SensorFeedPublisher:
+    """
+    Sampler listener that forwards every sample as one fixed-size datagram to
+    the feed socket. Sends never block: with no receiver, or a full receiver
+    queue, the sample is dropped and counted.
+    """
+
+    def __init__(self, path=FEED_PATH):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def publish(self, sample):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        record = FEED_RECORD.pack(
+            sample.name.encode()[:8], sample.status == "ok", self.seq,
+            _f(sample.distance_cm), _f(sample.filtered_cm), _f(sample.velocity_cms),
+            _f(sample.ttc_s), sample.monotonic)
+        try:
+            self.sock.sendto(record, self.path)
+            self.sent += 1
+        except OSError:
+            # ENOENT/ECONNREFUSED: nobody listening yet; EAGAIN: receiver is behind
+            self.dropped += 1
+
+
+class SensorFeedReceiver:
+    """
+    Binds the feed socket and calls callback(FeedSample) from its own thread
+    as each datagram arrives, so consumers react within one sensor sample.
+    """
+
+    def __init__(self, callback, path=FEED_PATH):
+        self.callback = callback
+        self.path = path
+        self.sock = None
+        self.thread = None
+        self.running = False
+        self.latest = {}
+        self.received = 0
+
+    def start(self):
+        try:
+            os.unlink(self.path)   # stale socket from a previous run
+        except FileNotFoundError:
+            pass
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="sensor-feed", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            self.sock.close()
+        if self.thread:
+            self.thread.join(timeout=1)
+
+    def _run(self):
+        while self.running:
+            try:
+                data = self.sock.recv(FEED_RECORD.size)
+            except OSError:
+                break   # socket closed by stop()
+            if len(data) != FEED_RECORD.size:
+                continue
+            name, ok, seq, dist, filt, vel, ttc, mono = FEED_RECORD.unpack(data)
+            sample = FeedSample(name.rstrip(b"\0").decode(), bool(ok), seq, _opt(dist),
+                                _opt(filt), _opt(vel), _opt(ttc), mono)
+            self.latest[sample.name] = sample
+            self.received += 1
+            try:
+                self.callback(sample)
+            except Exception as e:
+                print(f"[ERROR] Sensor feed callback failed: {e}")
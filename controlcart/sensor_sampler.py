@@ -0,0 +1,257 @@
+# sensor_sampler.py
+import json
+import threading
+import time
+from collections import deque, namedtuple
+
+# One measurement as published by the sampler; the filtered fields are set
+# when the sampler runs a FilterPipeline for that sensor
+Sample = namedtuple("Sample", "name distance_cm status timestamp monotonic "
+                              "filtered_cm velocity_cms ttc_s",
+                    defaults=(None, None, None))
+
+
+class SensorSampler:
+    """
+    Background thread that owns the ultrasonic sensors and interleaves their
+    triggers on a fixed per-sensor cadence.
+
+    Two triggers of different sensors are never closer than the separation
+    configured for that pair, so a late echo of one sensor is not picked up
+    as the echo of the next one.
+    """
+
+    def __init__(self, sensors, rate_hz=20.0, min_separation=0.02, pair_separation=None,
+                 filter_factory=None):
+        self.sensors = dict(sensors)
+        # one streaming filter per sensor, updated on every raw sample
+        self.filters = {name: filter_factory() for name in self.sensors} if filter_factory else {}
+        self.period = 1.0 / rate_hz
+        self.min_separation = min_separation
+        # {("front", "rear"): 0.03, ...}; order of the names does not matter
+        self.pair_separation = {frozenset(k): v for k, v in (pair_separation or {}).items()}
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.latest = {}
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+
+        now_wall, now_mono = time.time(), time.monotonic()
+        for name, sensor in self.sensors.items():
+            if not self._active(sensor):
+                self.latest[name] = Sample(name, None, "not detected", now_wall, now_mono)
+
+    @staticmethod
+    def _active(sensor):
+        return sensor is not None and getattr(sensor, "available", False)
+
+    def subscribe(self, callback):
+        """callback(sample) runs on the sampler thread for every new sample."""
+        self.listeners.append(callback)
+
+    def get_latest(self, name=None):
+        with self.lock:
+            if name is None:
+                return dict(self.latest)
+            return self.latest.get(name)
+
+    def _separation(self, a, b):
+        return self.pair_separation.get(frozenset((a, b)), self.min_separation)
+
+    def _publish(self, sample):
+        with self.lock:
+            self.latest[sample.name] = sample
+        for callback in self.listeners:
+            try:
+                callback(sample)
+            except Exception as e:
+                print(f"[ERROR] Sampler listener failed: {e}")
+
+    def _run(self):
+        active = [n for n, s in self.sensors.items() if self._active(s)]
+        if not active:
+            return
+        now = time.monotonic()
+        # stagger the sensors evenly inside one period
+        next_due = {n: now + i * self.period / len(active) for i, n in enumerate(active)}
+        last_trigger = {n: float("-inf") for n in active}
+
+        while self.running:
+            name = min(active, key=next_due.get)
+            start = next_due[name]
+            for other in active:
+                if other != name:
+                    start = max(start, last_trigger[other] + self._separation(name, other))
+
+            delay = start - time.monotonic()
+            if delay > 0 and self.wakeup.wait(delay):
+                break
+
+            triggered = time.monotonic()
+            last_trigger[name] = triggered
+            dist = self.sensors[name].get_distance()
+            status = "ok" if dist is not None else "timeout"
+            sample = Sample(name, dist, status, time.time(), triggered)
+            if name in self.filters:
+                filtered = self.filters[name].update(dist, triggered)
+                if filtered is not None:
+                    sample = sample._replace(filtered_cm=filtered.distance_cm,
+                                             velocity_cms=filtered.velocity_cms,
+                                             ttc_s=filtered.ttc_s)
+            self._publish(sample)
+
+            next_due[name] += self.period
+            if next_due[name] < triggered:
+                # fell behind (slow echoes): restart the cadence instead of bursting
+                next_due[name] = triggered + self.period
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.wakeup.clear()
+        self.thread = threading.Thread(target=self._run, name="sensor-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+
+
+class SampleBuffer:
+    """
+    Lock-protected ring of recent samples per sensor. Registered as a sampler
+    listener, it lets readers answer from memory without touching the pins.
+    """
+
+    def __init__(self, names, size=100):
+        self.lock = threading.Lock()
+        self.rings = {name: deque(maxlen=size) for name in names}
+
+    def append(self, sample):
+        with self.lock:
+            self.rings[sample.name].append(sample)
+
+    def _select(self, name, samples=None, window_ms=None, max_age_ms=None):
+        now = time.monotonic()
+        oldest = float("-inf")
+        if window_ms is not None:
+            oldest = now - window_ms / 1000.0
+        if max_age_ms is not None:
+            oldest = max(oldest, now - max_age_ms / 1000.0)
+        with self.lock:
+            ring = self.rings[name]
+            recent = [smp for smp in ring if smp.monotonic >= oldest]
+        if samples is not None:
+            recent = recent[-samples:]
+        return recent, now
+
+    def window(self, name, samples=None, window_ms=None, max_age_ms=None):
+        """Mean/median/min over the last 'samples' readings and/or the last window_ms."""
+        recent, now = self._select(name, samples, window_ms, max_age_ms)
+        if not recent:
+            return {"status": "stale", "count": 0}
+        values = sorted(smp.distance_cm for smp in recent if smp.distance_cm is not None)
+        result = {
+            "count": len(values),
+            "age_ms": (now - recent[-1].monotonic) * 1000.0,
+            "timestamp": recent[-1].timestamp,
+        }
+        last = recent[-1]
+        if last.filtered_cm is not None:
+            result.update(filtered=last.filtered_cm, velocity=last.velocity_cms, ttc=last.ttc_s)
+        if not values:
+            result["status"] = "timeout"
+            return result
+        mid = len(values) // 2
+        median = values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+        result.update(status="ok", mean=sum(values) / len(values), median=median, min=values[0])
+        return result
+
+
+class Subscription:
+    """Bounded per-client queue: when full the oldest event is dropped, never the publisher."""
+
+    def __init__(self, size=32):
+        self.queue = deque(maxlen=size)
+        self.cond = threading.Condition()
+        self.dropped = 0
+
+    def push(self, event):
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(event)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """All pending events (oldest first); empty list on timeout."""
+        with self.cond:
+            if not self.queue:
+                self.cond.wait(timeout)
+            events = list(self.queue)
+            self.queue.clear()
+            return events
+
+
+class SampleBroadcaster:
+    """Fans every sample out to all subscribers tagged with a monotonic sequence number."""
+
+    def __init__(self, queue_size=32):
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.seq = 0
+
+    def publish(self, sample):
+        with self.lock:
+            self.seq += 1
+            event = (self.seq, sample)
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            sub.push(event)
+
+    def subscribe(self, sub=None):
+        """New Subscription, or any object with push(event) (e.g. an asyncio bridge)."""
+        sub = sub if sub is not None else Subscription(self.queue_size)
+        with self.lock:
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscribers.discard(sub)
+
+
+def buffered_reading(buffer, sensor, name, samples=None, window_ms=None, max_age_ms=None):
+    """Reading computed from the buffered samples of one sensor (HTTP response body)."""
+    if sensor is None or not getattr(sensor, "available", False):
+        return {"distance_cm": 0.0, "status": "not detected"}
+    stats = buffer.window(name, samples=samples, window_ms=window_ms, max_age_ms=max_age_ms)
+    result = {"distance_cm": round(stats.get("mean", 0.0), 2), "status": stats["status"],
+              "samples": stats["count"]}
+    if "median" in stats:
+        result["median_cm"] = round(stats["median"], 2)
+        result["min_cm"] = round(stats["min"], 2)
+    if "filtered" in stats:
+        result["filtered_cm"] = round(stats["filtered"], 2)
+        result["velocity_cms"] = round(stats["velocity"], 2) if stats["velocity"] is not None else None
+        result["ttc_s"] = round(stats["ttc"], 2) if stats["ttc"] is not None else None
+    if "age_ms" in stats:
+        result["age_ms"] = round(stats["age_ms"], 1)
+        result["timestamp"] = stats["timestamp"]
+    return result
+
+
+def sse_event(seq, sample):
+    """One Server-Sent Events message for a broadcast sample."""
+    data = json.dumps({
+        "seq": seq, "sensor": sample.name, "timestamp": sample.timestamp,
+        "status": sample.status, "distance_cm": sample.distance_cm,
+        "filtered_cm": sample.filtered_cm, "velocity_cms": sample.velocity_cms,
+        "ttc_s": sample.ttc_s,
+    }, separators=(",", ":"))
+    return f"id: {seq}\nevent: sample\ndata: {data}\n\n"
@@ -1,27 +1,82 @@
 # ultrasonic_sensor.py
+import os
+import select
 import time
-from gpio_adapter import GPIOAdapter
+from gpio_adapter import (GPIOAdapter, ChardevLines, GPIO_V2_LINE_FLAG_INPUT,
+                          GPIO_V2_LINE_FLAG_EDGE_RISING, GPIO_V2_LINE_FLAG_EDGE_FALLING)
+
+# "edge": interrupt-driven echo timing (default), "poll": original busy-wait loop
+ULTRASONIC_MODE = os.getenv("ULTRASONIC_MODE", "edge")
+
+
+class _ChardevEcho:
+    """Echo line requested from the gpiochip; edges carry kernel timestamps."""
+
+    def __init__(self, echo_pin):
+        self.line = ChardevLines(
+            [echo_pin],
+            flags=(GPIO_V2_LINE_FLAG_INPUT | GPIO_V2_LINE_FLAG_EDGE_RISING
+                   | GPIO_V2_LINE_FLAG_EDGE_FALLING),
+            consumer="ultrasonic", event_buffer_size=16)
+
+    def arm(self):
+        self.line.drain()
+
+    def wait_edges(self, timeout):
+        return self.line.read_events(timeout)
+
+
+class _SysfsEcho:
+    """Sysfs echo pin with edge=both; edges are timestamped when poll() wakes up."""
+
+    def __init__(self, gpio):
+        gpio.set_edge("both")
+        self.gpio = gpio
+        self.poller = select.poll()
+        self.poller.register(gpio.fileno(), select.POLLPRI | select.POLLERR)
+        gpio.read()
+
+    def arm(self):
+        # reading the value clears any pending edge notification
+        self.gpio.read()
+
+    def wait_edges(self, timeout):
+        if not self.poller.poll(max(0.0, timeout) * 1000.0):
+            return []
+        ts = time.monotonic_ns()
+        return [(ts, self.gpio.read() == 1)]
 
 class UltrasonicSensor:
     """
     Robust control for an HC-SR04 ultrasonic sensor using GPIOAdapter.
     Includes timeout and safe error handling.
+
+    In "edge" mode the echo pulse is timed from edge events (gpiochip line
+    events, or sysfs edge=both + poll) instead of spinning on echo.read().
     """
 
     SPEED_OF_SOUND = 34300  # cm/s (approx. at 20°C)
 
-    def __init__(self, trig_pin=5, echo_pin=6, max_distance_cm=400.0, timeout=0.04):
+    def __init__(self, trig_pin=5, echo_pin=6, max_distance_cm=400.0, timeout=0.04,
+                 mode=None):
         self.trig_pin = trig_pin
         self.echo_pin = echo_pin
         self.max_distance_cm = max_distance_cm
         self.timeout = timeout
+        self.mode = mode or ULTRASONIC_MODE
+        self.echo = None
+        self.echo_events = None
 
         try:
             self.trig = GPIOAdapter(trig_pin)
-            self.echo = GPIOAdapter(echo_pin)
-
             self.trig.set_direction("out")
-            self.echo.set_direction("in")
+
+            if self.mode == "edge":
+                self.echo_events = self._open_echo_events()
+            if self.echo is None and self.echo_events is None:
+                self.echo = GPIOAdapter(echo_pin)
+                self.echo.set_direction("in")
+
             self.trig.write(0)
             time.sleep(0.05)
             self.available = True
@@ -29,6 +84,21 @@ class UltrasonicSensor:
             print(f"[ERROR] Failed to initialize sensor (TRIG={trig_pin}, ECHO={echo_pin}): {e}")
             self.available = False
 
+    def _open_echo_events(self):
+        """Prefer gpiochip line events, then sysfs edges; None falls back to polling."""
+        try:
+            return _ChardevEcho(self.echo_pin)
+        except OSError as e:
+            print(f"[WARN] gpiochip events unavailable for ECHO={self.echo_pin}: {e}")
+        try:
+            self.echo = GPIOAdapter(self.echo_pin)
+            self.echo.set_direction("in")
+            return _SysfsEcho(self.echo)
+        except OSError as e:
+            print(f"[WARN] Edge mode unavailable for ECHO={self.echo_pin}, polling instead: {e}")
+            self.mode = "poll"
+            return None
+
     def _send_pulse(self):
         """Send a 10µs pulse safely."""
         try:
@@ -44,23 +114,13 @@ class UltrasonicSensor:
             return None
 
         try:
-            self._send_pulse()
-            start_time = time.time()
-
-            # Wait for echo to go HIGH
-            while self.echo.read() == 0:
-                if time.time() - start_time > self.timeout:
-                    return None
-
-            pulse_start = time.time()
-
-            # Wait for echo to go LOW
-            while self.echo.read() == 1:
-                if time.time() - pulse_start > self.timeout:
-                    return None
+            if self.echo_events is not None:
+                pulse_duration = self._echo_width_edges()
+            else:
+                pulse_duration = self._echo_width_poll()
+            if pulse_duration is None:
+                return None
 
-            pulse_end = time.time()
-            pulse_duration = pulse_end - pulse_start
             distance = (pulse_duration * self.SPEED_OF_SOUND) / 2
 
             if distance > self.max_distance_cm or distance < 1:
@@ -72,6 +132,44 @@ class UltrasonicSensor:
             print(f"[ERROR] get_distance() failed (TRIG={self.trig_pin}, ECHO={self.echo_pin}): {e}")
             return None
 
+    def _echo_width_edges(self):
+        """Echo pulse width in seconds from edge timestamps, or None on timeout."""
+        self.echo_events.arm()
+        self._send_pulse()
+        deadline = time.monotonic() + self.timeout
+        rise = None
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            for ts, rising in self.echo_events.wait_edges(remaining):
+                if rising:
+                    rise = ts
+                    # same budget as the polling loop: timeout for the echo itself
+                    deadline = ts / 1e9 + self.timeout
+                elif rise is not None:
+                    return (ts - rise) / 1e9
+
+    def _echo_width_poll(self):
+        """Echo pulse width in seconds by busy-waiting on the echo pin."""
+        self._send_pulse()
+        start_time = time.time()
+
+        # Wait for echo to go HIGH
+        while self.echo.read() == 0:
+            if time.time() - start_time > self.timeout:
+                return None
+
+        pulse_start = time.time()
+
+        # Wait for echo to go LOW
+        while self.echo.read() == 1:
+            if time.time() - pulse_start > self.timeout:
+                return None
+
+        return time.time() - pulse_start
+
     def get_average_distance(self, samples=5, delay=0.05):
         """Take several measurements and average them."""
         if not self.available:
@@ -90,3 +188,18 @@ class UltrasonicSensor:
         readings.sort()
         valid = readings[1:-1] if len(readings) > 3 else readings
         return sum(valid) / len(valid)
+
+
+def init_sensor(name, trig, echo, timeout):
+    """Sensor ready to sample, or None if it cannot be opened or does not answer."""
+    try:
+        sensor = UltrasonicSensor(trig_pin=trig, echo_pin=echo, timeout=timeout)
+        test = sensor.get_distance()
+        if test is None:
+            print(f"[WARN] Sensor '{name}' not responding. Marked as inactive.")
+            return None
+        print(f"[OK] Sensor '{name}' initialized successfully.")
+        return sensor
+    except Exception as e:
+        print(f"[ERROR] Cannot initialize sensor '{name}': {e}")
+        return None